@@ -20,17 +20,18 @@ def state_calibration(
     
     start_time = time.time()
     results=[]
+    spot_setup = SpotSetup(
+        state,
+        timetable,
+        output_file_path,
+        name_of_run,
+        n_initial_infections,
+        n,
+        n_internal_runs,
+        n_calibration_runs,
+        )
     sampler = spotpy.algorithms.lhs(
-        SpotSetup(
-            state,
-            timetable,
-            output_file_path,
-            name_of_run,
-            n_initial_infections,
-            n,
-            n_internal_runs,
-            n_calibration_runs,
-            ),
+        spot_setup,
         dbname=output_file_path, 
         dbformat='csv',
         parallel=('mpi' if parallel == True else "seq"),
@@ -38,6 +39,9 @@ def state_calibration(
     sampler.sample(n_calibration_runs)
     results.append(sampler.getdata())
     
+    # stop the worker processes of the model (reused by all calibration runs)
+    spot_setup.model.close()
+    
     end_time = time.time()
     duration_time = end_time - start_time
     print("duration time:", duration_time)
@@ -76,6 +80,9 @@ class SpotSetup(object):
             spotpy.parameter.Uniform("n_ticks_to_quarantine", 10, 30, 1, 15),
             ]
         self.model = Sim(state = self.state)
+        
+        # only the average trajectory is needed for the calibration (see Sim.run)
+        self.model.keep_replicates = False
         self.evaluation_data = self.model.eval_data
         pd.Series(self.evaluation_data).to_csv(self.output_file_path + "_eval_data.csv", index = False)
         
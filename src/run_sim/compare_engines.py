@@ -0,0 +1,21 @@
+from pathlib import Path
+
+import src
+from src.run_sim.def_compare_engines import compare_engines
+from src.run_sim.def_get_params import get_spotpy_params
+
+
+spotpy_params = get_spotpy_params(Path.joinpath(src.PATH, "important_outputs", "params", "LHS_BY_2021_01_14.csv"))
+
+# error of the tau-leaping engine compared to the exact (vectorized) engine
+df = compare_engines(
+    state = 9,
+    infection_prob = spotpy_params["infection_prob"],
+    n_ticks_to_quarantine = spotpy_params["ticks_to_quarantine"],
+    exact_engine = "array",
+    approximate_engine = "tau",
+    n_cores = 15,
+    seed = 1,
+    )
+
+df.to_csv(Path.joinpath(src.PATH, "output_data", "compare_engines_BY.csv"))
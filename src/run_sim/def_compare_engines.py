@@ -0,0 +1,69 @@
+from typing import Union
+
+import pandas as pd
+
+from src.sim.sim import Sim
+from src.misc.timetables import *
+
+
+def compare_engines(
+        state: int,
+        infection_prob: float,
+        n_ticks_to_quarantine: Union[int, float],
+        exact_engine: str = "array",
+        approximate_engine: str = "tau",
+        timetable: dict = timetable_default,
+        n_cores: int = 1,
+        n_internal_runs: int = 60,
+        n_initial_infections: int = 50,
+        n: int = 100000,
+        seed: int = None,
+    ) -> pd.DataFrame:
+    
+    """
+    Runs the same parameter setting with an exact and an approximate engine and
+    returns the error of the approximate engine on the average trajectory of
+    "adj_cumulative_cases/100k" (the data used for calibration) per day.
+    The standard deviation of the exact engine's repetitions is given for comparison.
+    """
+    
+    params = [
+        infection_prob,
+        n_initial_infections,
+        n,
+        0, # number of random infections
+        timetable,
+        n_ticks_to_quarantine,
+        n_internal_runs,
+        "compare_engines_" + str(state),
+        False, # save output
+        False, # display simulation
+        ]
+    
+    # run both engines
+    outputs = {}
+    for engine in (exact_engine, approximate_engine):
+        with Sim(state=state, n_cores=n_cores, engine=engine, seed=seed) as model:
+            # only the daily statistics of the replications are needed
+            model.keep_replicates = False
+            outputs[engine] = model.run(params)["statistics"].set_index("day")
+    
+    # average trajectory of each engine
+    exact = outputs[exact_engine]
+    approximate = outputs[approximate_engine]
+    
+    df = pd.DataFrame({
+        "exact": exact["adj_cumulative_cases/100k"],
+        "approximate": approximate["adj_cumulative_cases/100k"],
+        "sd_exact": exact["adj_cumulative_cases/100k_sd"],
+        })
+    df["error"] = df["approximate"] - df["exact"]
+    df["relative_error"] = df["error"] / df["exact"]
+    
+    print("engines:", exact_engine, "vs.", approximate_engine)
+    print("mean absolute error:", df["error"].abs().mean())
+    print("maximum absolute error:", df["error"].abs().max())
+    print("relative error on the last day:", df["relative_error"].iloc[-1])
+    print("RMSE:", (df["error"] ** 2).mean() ** 0.5)
+    
+    return df
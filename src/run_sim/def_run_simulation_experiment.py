@@ -2,28 +2,30 @@ import datetime as dt
 import math
 import os
 import time
-from typing import Union
+from typing import Dict, List, Union
 
 from joblib import Parallel, delayed
 from matplotlib import pyplot as plt
 import seaborn as sns
 
+from src.sim.experiment import run_scenarios
 from src.sim.sim import Sim
 from src.misc.timetables import *
 
 
-def run_simulation_experiment(
+def get_params_experiment(
         state: int,
         infection_prob: float,
         n_ticks_to_quarantine: Union[int, float],
-        n_cores: int = 1,
         n_internal_runs: int = 60,
         n_initial_infections: int = 50,
         n: int = 100000,
         n_random_infections: Union[int, float] = 0,
         save_output: bool = True,
         display_simulation: bool = False,
-    ):
+    ) -> List[list]:
+    
+    """Returns the parameter values (see Sim.run) of each scenario of the experiment of a state."""
 
     # list of all timetables + a scenario name
     timetables = [
@@ -53,10 +55,67 @@ def run_simulation_experiment(
          display_simulation,
         ] for timetable in timetables]
     
-    # create state-specific simulation model
-    model = Sim(state=state, n_cores=n_cores)
+    return params_experiment
+
+
+def run_simulation_experiments(experiments: Dict[int, dict], n_cores: int = 1) -> Dict[int, list]:
+    
+    """
+    Runs the experiments of several states together on one pool of n_cores worker processes
+    (see src.sim.experiment.run_scenarios), instead of one script with its own processes per state.
+    experiments maps each state to the arguments of its experiment (see get_params_experiment).
+    Returns the outputs of the scenarios (see Sim.run) of each state.
+    """
+    
+    # create state-specific simulation models
+    models = {state: Sim(state=state, n_cores=n_cores) for state in experiments}
+    
+    # all scenarios of all states
+    scenarios = [
+        (models[state], params)
+        for state, arguments in experiments.items()
+        for params in get_params_experiment(state, **arguments)
+        ]
+    
+    # run the replications of all scenarios in a single queue
+    outputs = run_scenarios(scenarios, n_cores)
+    
+    # outputs of each state
+    results = {state: [] for state in experiments}
+    for (model, params), output in zip(scenarios, outputs):
+        results[model.state].append(output)
+    
+    return results
+
 
-    # run scenarios step by step
-    results = [model.run(params) for params in params_experiment]
+def run_simulation_experiment(
+        state: int,
+        infection_prob: float,
+        n_ticks_to_quarantine: Union[int, float],
+        n_cores: int = 1,
+        n_internal_runs: int = 60,
+        n_initial_infections: int = 50,
+        n: int = 100000,
+        n_random_infections: Union[int, float] = 0,
+        save_output: bool = True,
+        display_simulation: bool = False,
+    ):
+    
+    # run all scenarios of the state (in a single queue of replications)
+    results = run_simulation_experiments(
+        {
+            state: {
+                "infection_prob": infection_prob,
+                "n_ticks_to_quarantine": n_ticks_to_quarantine,
+                "n_internal_runs": n_internal_runs,
+                "n_initial_infections": n_initial_infections,
+                "n": n,
+                "n_random_infections": n_random_infections,
+                "save_output": save_output,
+                "display_simulation": display_simulation,
+                },
+            },
+        n_cores,
+        )
     
-    return results
\ No newline at end of file
+    return results[state]
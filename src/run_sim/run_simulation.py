@@ -34,6 +34,14 @@ NAME_OF_RUN = "baseline_scenario_bavaria"
 # number of cores used for parallel computation
 N_CORES = 15
 
+# simulation engine ("agent" = one object per agent, "array" = vectorized and much faster,
+# "batch" = vectorized, with all replications of a core simulated together,
+# "tau" = vectorized and approximate, for large populations)
+ENGINE = "agent"
+
+# seed of the random numbers (None = random seed, an integer makes the results reproducible)
+SEED = None
+
 ##################################################################################
 # model setup and execution (do not touch)
 ##################################################################################
@@ -68,5 +76,5 @@ params = [
      DISPLAY_SIMULATION,
     ]
 
-model = Sim(STATE, n_cores=N_CORES)
-output = model.run(params)
\ No newline at end of file
+with Sim(STATE, n_cores=N_CORES, engine=ENGINE, seed=SEED) as model:
+    output = model.run(params)
\ No newline at end of file
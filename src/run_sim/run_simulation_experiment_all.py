@@ -0,0 +1,25 @@
+from pathlib import Path
+
+import src
+from src.run_sim.def_run_simulation_experiment import run_simulation_experiments
+from src.run_sim.def_get_params import get_spotpy_params
+
+
+# calibrated parameters of each state
+params_files = {
+    2:  "LHS_HH_2021_01_22.csv",
+    8:  "LHS_BW_2021_01_20.csv",
+    9:  "LHS_BY_2021_01_14.csv",
+    10: "LHS_SL_2021_01_20.csv",
+    }
+
+experiments = {}
+for state, params_file in params_files.items():
+    spotpy_params = get_spotpy_params(Path.joinpath(src.PATH, "important_outputs", "params", params_file))
+    experiments[state] = {
+        "infection_prob": spotpy_params["infection_prob"],
+        "n_ticks_to_quarantine": spotpy_params["ticks_to_quarantine"],
+        }
+
+# all states share one pool of worker processes
+results = run_simulation_experiments(experiments, n_cores=15)
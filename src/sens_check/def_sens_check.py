@@ -40,12 +40,12 @@ def sens_check(state, spotpy_output_data_path, parallel = True):
              DISPLAY_SIMULATION,
             ]
         
-        model = Sim(state)
-        
-        if value:
-            setattr(model, attrname, value)
-        
-        output = model.run(params)
+        with Sim(state) as model:
+            
+            if value:
+                setattr(model, attrname, value)
+            
+            output = model.run(params)
         
         df = output["df"]
         
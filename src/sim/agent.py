@@ -1,12 +1,60 @@
-import random
+import math
 from typing import Optional
 
 from src.sim.cell import Cell
+from src.sim.codes import *
+from src.sim.rng import RandomNumbers
 
 
 class Agent:
     max_agents_on_cell: Optional[int] = None
     moving_prob: Optional[float] = None
+    
+    # fixed set of attributes instead of a __dict__ per agent
+    __slots__ = (
+        "name",
+        "residence_cell",
+        "x_grid_pos",
+        "y_grid_pos",
+        "gender",
+        "age",
+        "infection",
+        "tick_of_exposure",
+        "tick_of_infectivity",
+        "tick_of_recovery",
+        "tick_of_symptom_onset",
+        "tick_of_quarantine",
+        "home_cell",
+        "work_place",
+        "school",
+        "kindergarten",
+        "university",
+        "fav_supermarkets",
+        "cell_of_infection",
+        "target_cell",
+        "activity",
+        "activity_len_in_ticks",
+        "tick_of_activity_end",
+        "groups",
+        "room",
+        "position_in_room",
+        "activities_done_today",
+        "stay_at_home",
+        "work_at_home",
+        "quarantine",
+        "household",
+        "duration_s",
+        "duration_i",
+        "duration_r_a",
+        "duration_r_m",
+        "p_sym",
+        "nace2",
+        "nace2_short",
+        "work_hours_day_in_ticks",
+        "hours_at_supermarket_in_ticks",
+        "student",
+        "pid",
+        )
 
     def __init__(self):
 
@@ -20,21 +68,21 @@ class Agent:
         self.x_grid_pos: Optional[int] = None
         self.y_grid_pos: Optional[int] = None
         
-        # population list
-        self.population = list
-
         # gender
         self.gender: Optional[int] = None
         
         # age
         self.age: Optional[int] = None
         
-        # SEIR-state
-        self.infection: str = "s"                    
+        # SEIR-state (see src.sim.codes)
+        self.infection: int = S
         
         # time step when infection happened
         self.tick_of_exposure: Optional[int] = None             
         
+        # time step when agent became infectious
+        self.tick_of_infectivity: Optional[int] = None
+        
         # time step when agent was cured
         self.tick_of_recovery: Optional[int] = None
         
@@ -48,6 +96,7 @@ class Agent:
         self.work_place = None                  
         self.school = None                      
         self.kindergarten = None                
+        self.university = None
         self.fav_supermarkets = []
 
         # location where the infection happend
@@ -56,48 +105,98 @@ class Agent:
         # temporary destinations during activities
         self.target_cell = None           
         
-        # name of activity the agent is doing
-        self.activity = None
+        # activity the agent is doing (see src.sim.codes)
+        self.activity: int = NO_ACTIVITY
         
         # planned execution time of activity in time steps
         self.activity_len_in_ticks = None
         
-        # time steps the agent has executed the activity so far
-        self.ticks_doing_this_activity = None
+        # tick at the end of which the agent stops the activity and goes home
+        self.tick_of_activity_end: Optional[int] = None
         
-        # dictionary of rooms assigned to the agent in certain locations
-        # key = location; value = room
-        self.group_dict = {"street": 0}
+        # rooms assigned to the agent in certain locations
+        # index = location type (see src.sim.codes); value = room
+        self.groups = [0] * N_LOCATION_TYPES
         
-        # list of activities an agent has done during the day
-        self.activities_done_today = []
+        # the room the agent is in at the moment and its position in the room's list of agents
+        self.room: Optional[int] = None
+        self.position_in_room: Optional[int] = None
+        
+        # activities an agent has done during the day (bit field, see get_activity_flag())
+        self.activities_done_today: int = 0
         
         # Does the agent leave the house?
         self.stay_at_home = False
         
+        # Does the agent work at home today? (drawn for all workers at 8 o'clock)
+        self.work_at_home = False
+        
         # Is the agent in quarantine?
         self.quarantine = False
+        self.tick_of_quarantine: Optional[int] = None
         
-        # list of agents living with the agent
-        self.household_members = []
+        # the household of the agent (shared by all members, see src.sim.population.Household)
+        self.household = None
         
         # time spans of stages of infections (in ticks)
         self.duration_s = None 
         self.duration_i = None 
         self.duration_r_a = None 
         self.duration_r_m = None 
+        
+        # probability of developing symptoms
+        self.p_sym: Optional[float] = None
+        
+        # attributes copied from the SOEP
+        self.nace2: Optional[int] = None
+        self.nace2_short: Optional[int] = None
+        self.work_hours_day_in_ticks = None
+        self.hours_at_supermarket_in_ticks = None
+        self.student: Optional[int] = None
+        self.pid: Optional[int] = None
+    
+    
+    # attributes of the household
+    
+    @property
+    def hid(self) -> Optional[int]:
+        return self.household.hid if self.household is not None else None
+    
+    
+    @property
+    def federal_state(self) -> Optional[int]:
+        return self.household.federal_state if self.household is not None else None
+    
+    
+    @property
+    def household_members(self) -> list:
+        """The other agents living with the agent."""
+        return [member for member in self.household.members if member is not self] if self.household is not None else []
 
 
 
     def move_in(self, new_residence_cell):
         self.residence_cell = new_residence_cell                        
-        self.residence_cell.dict_of_residents.update({self.name: self}) 
         self.x_grid_pos = self.residence_cell.x_grid_pos   
         self.y_grid_pos = self.residence_cell.y_grid_pos
+        
+        # join the agents of my room
+        self.room = self.groups[self.residence_cell.location_type]
+        agents_in_my_room = self.residence_cell.rooms.setdefault(self.room, [])
+        self.position_in_room = len(agents_in_my_room)
+        agents_in_my_room.append(self)
 
 
     def move_out(self):
-        del(self.residence_cell.dict_of_residents[self.name]) 
+        # leave the agents of my room by moving the last agent of the list to my position
+        agents_in_my_room = self.residence_cell.rooms[self.room]
+        last_agent = agents_in_my_room.pop()
+        if last_agent is not self:
+            agents_in_my_room[self.position_in_room] = last_agent
+            last_agent.position_in_room = self.position_in_room
+        self.room = None
+        self.position_in_room = None
+        
         self.residence_cell = None            
         self.x_grid_pos = None                 
         self.y_grid_pos = None                 
@@ -108,44 +207,47 @@ class Agent:
         self.move_in(new_residence_cell)   
 
 
-    def infect(self, tick: int, location_dependend_infection_prob_dict: dict):
+    def infect(self, tick: int, location_dependend_infection_prob_dict: dict, rng: RandomNumbers):
         """
         Models the potential tranmission of the virus.
         If this agent is infectious, it randomly chooses another agent that is
         currently in the same room at the same location and infects the chosen agent
         by a certain probability.
+        Returns the newly exposed agent (or None).
         """
 
-        # if agent is in any infectious state and if the agent is not the only one on his cell
-        if self.infection in ["i", "a", "m"] and len(self.residence_cell.dict_of_residents) > 1:
+        # if agent is in any infectious state
+        if self.infection in (I, A, M):
             
             # get type of current location
-            location = self.residence_cell.cell_type
+            location = self.residence_cell.location_type
 
-            # get all agents on my cell in my group/room
-            agents_in_my_group = [
-                agent
-                for agent in list(self.residence_cell.dict_of_residents.values())
-                if agent.group_dict[location] == self.group_dict[location] and agent != self
-                ]
+            # get all agents on my cell in my group/room (including myself)
+            agents_in_my_room = self.residence_cell.rooms[self.room]
 
             # if there are other agents in the same group/room
-            if len(agents_in_my_group) > 0:
+            if len(agents_in_my_room) > 1:
                 
-                # pick one agent at random
-                random_agent = random.choice(agents_in_my_group)
+                # pick one of the other agents at random
+                position = rng.randrange(len(agents_in_my_room) - 1)
+                if position >= self.position_in_room:
+                    position += 1
+                random_agent = agents_in_my_room[position]
                 
                 # if the chosen agent is susceptible
-                if random_agent.infection == "s":
+                if random_agent.infection == S:
                     
                     # expose the selected agent with a certain probability
-                    if random.random() < location_dependend_infection_prob_dict[location]:
-                        random_agent.infection = "e"
+                    if rng.random() < location_dependend_infection_prob_dict[location]:
+                        random_agent.infection = E
                         random_agent.tick_of_exposure = tick
                         random_agent.cell_of_infection = self.residence_cell
+                        return random_agent
+        
+        return None
                 
                 
-    def update_status_of_infection(self, tick):
+    def update_status_of_infection(self, tick, rng: RandomNumbers):
         """
         Updates the status on infection each tick.
         Changes the status on infection
@@ -156,39 +258,64 @@ class Agent:
         """
         
         # if agent has been exposed but is not yet infectious
-        if self.infection == "e":
+        if self.infection == E:
             
             if tick - self.tick_of_exposure >= self.duration_s:
-                self.infection = "i"
+                self.infection = I
                 self.tick_of_infectivity = tick
 
         # if agent is currently infectious
-        elif self.infection == "i":
+        elif self.infection == I:
             if tick - self.tick_of_infectivity > self.duration_i:
                 self.tick_of_symptom_onset = tick
                 
                 # develop symptoms by an agent specific probability
-                if random.random() < self.p_sym:
+                if rng.random() < self.p_sym:
                     
                     # develop mild symptoms
-                    self.infection = "m"
+                    self.infection = M
                     
                 else:
                     # asymptomatic
-                    self.infection = "a"
+                    self.infection = A
         
         # if agent is asymptomatic infected
-        elif self.infection == "a":
+        elif self.infection == A:
             if tick - self.tick_of_symptom_onset > self.duration_r_a:
-                self.infection = "r"
+                self.infection = R
                 self.tick_of_recovery = tick
         
         # if agent is infected with mild symptoms
-        elif self.infection == "m":
+        elif self.infection == M:
             
             if tick - self.tick_of_symptom_onset > self.duration_r_m:
-                self.infection = "r"
+                self.infection = R
                 self.tick_of_recovery = tick
+    
+    
+    def get_tick_of_next_transition(self) -> Optional[int]:
+        """
+        Returns the first tick in which update_status_of_infection() changes the
+        current status of infection (None if the status will not change anymore).
+        """
+        
+        # tick - tick_of_exposure >= duration_s
+        if self.infection == E:
+            return self.tick_of_exposure + math.ceil(self.duration_s)
+        
+        # tick - tick_of_infectivity > duration_i
+        elif self.infection == I:
+            return self.tick_of_infectivity + math.floor(self.duration_i) + 1
+        
+        # tick - tick_of_symptom_onset > duration_r_a
+        elif self.infection == A:
+            return self.tick_of_symptom_onset + math.floor(self.duration_r_a) + 1
+        
+        # tick - tick_of_symptom_onset > duration_r_m
+        elif self.infection == M:
+            return self.tick_of_symptom_onset + math.floor(self.duration_r_m) + 1
+        
+        return None
             
     
     
@@ -200,7 +327,7 @@ class Agent:
         """
         
         # if agent has symptoms
-        if self.infection in ["m"]:
+        if self.infection == M:
             
             # wait until the number of ticks since symptom onset is higher than "ticks_to_staying_at_home"
             if tick - self.tick_of_symptom_onset >= ticks_to_staying_at_home:
@@ -218,7 +345,7 @@ class Agent:
         If an agent is in quarantine, it stays at home for 14 days.
         """
         # if one has symptoms and is not yet in quarantine
-        if self.infection in ["m"] and not self.quarantine:
+        if self.infection == M and not self.quarantine:
             
             # wait until some time has passed since symptom onset
             if tick - self.tick_of_symptom_onset >= ticks_to_isolate_household:
@@ -227,7 +354,7 @@ class Agent:
                 self.tick_of_quarantine = tick
                 self.quarantine = True
                 
-                for member in self.household_members:
+                for member in self.household.members:
                     member.tick_of_quarantine = tick
                     member.quarantine = True
                     
@@ -244,7 +371,7 @@ class Agent:
 
     def initialize_activity(
             self,
-            name_of_activity,       
+            activity: int,       
             target_cell,            
             activity_len_in_ticks,  
             overwrite = False,
@@ -254,41 +381,36 @@ class Agent:
         
         # if the agent is doing nothing or this activity is allowed to overwrite the current activity
         if (not self.activity) or overwrite:
-            self.activity = name_of_activity
+            self.activity = activity
             self.target_cell = target_cell
             self.activity_len_in_ticks = activity_len_in_ticks
-            self.ticks_doing_this_activity = 0
+            self.tick_of_activity_end = None
             
-            if name_of_activity not in self.activities_done_today:
-                self.activities_done_today.append(name_of_activity)
+            self.activities_done_today |= get_activity_flag(activity)
             
             
-    def do_activity(
-            self,
-            len_x_grid_dim,
-            len_y_grid_dim,
-            grid_as_matrix,
-            torus,
-    ):
-        """Executes the current activity."""
-
-        # if an activity is intialized
-        if self.activity:
-            
-            # if the agent is not at the right location
-            if self.target_cell:
-                # go to the location
-                self.move_to_this_cell(self.target_cell)
-                self.target_cell = None
-             
-            # if the planned execution time has not been reached
-            if self.ticks_doing_this_activity < self.activity_len_in_ticks:
-                self.ticks_doing_this_activity += 1
-
-            # if the planned execution time has been reached
-            else:
-                # stop the activity and go home
-                self.move_to_this_cell(self.home_cell)
-                self.activity = None
-                self.ticks_doing_this_activity = None
-                self.activity_len_in_ticks = None
\ No newline at end of file
+    def start_activity(self, tick: int) -> int:
+        """
+        Goes to the location of the newly initialized activity.
+        Returns the tick at the end of which the activity is stopped
+        (when the planned execution time has been reached).
+        """
+        
+        self.tick_of_activity_end = tick + max(math.ceil(self.activity_len_in_ticks), 0)
+        
+        # if the agent is not at the right location, go to the location
+        if self.target_cell is not self.residence_cell:
+            self.move_to_this_cell(self.target_cell)
+        self.target_cell = None
+        
+        return self.tick_of_activity_end
+    
+    
+    def stop_activity(self):
+        """Stops the current activity and goes home."""
+        
+        if self.residence_cell is not self.home_cell:
+            self.move_to_this_cell(self.home_cell)
+        self.activity = NO_ACTIVITY
+        self.tick_of_activity_end = None
+        self.activity_len_in_ticks = None
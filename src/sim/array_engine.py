@@ -0,0 +1,746 @@
+from typing import List, Tuple
+
+import numpy as np
+
+from src.sim.codes import *
+from src.sim.measures import Clock, CompiledTimetable
+from src.sim.rng import RandomNumbers
+from src.sim.schedule import TransitionSchedule
+from src.sim.world import World
+
+
+class ArrayEngine:
+    """
+    Vectorized alternative to the agent-based simulation loop in Sim.internal_run().
+    The state of all agents is copied from the built world into NumPy arrays
+    (struct of arrays). Each tick is then advanced by a few array operations
+    instead of calling the methods of every single Agent-object.
+
+    The behavioural rules are the same as in the Agent-class. The only difference is
+    that all agents act simultaneously within a tick instead of one after another.
+    Therefore the outputs are statistically equivalent, but not identical.
+
+    Several replicates (independently built worlds of the same parameter set) can be
+    simulated together by passing one world per replicate. Their agents and rooms are
+    concatenated into the same arrays and each agent carries the id of its replicate,
+    so that the Python overhead of each tick is shared by all replicates.
+    The replicates do not interact, because they do not share any room.
+    """
+
+    def __init__(
+            self,
+            model,
+            worlds: List[World],
+            location_dependend_infection_prob_dict: dict,
+            n_ticks_to_quarantine,
+            measures: CompiledTimetable,
+            clock: Clock,
+            rngs: List[RandomNumbers],
+            ):
+
+        # the Sim-object providing data and parameters
+        self.model = model
+
+        self.location_dependend_infection_prob_dict = location_dependend_infection_prob_dict
+        self.n_ticks_to_quarantine = n_ticks_to_quarantine
+        self.measures = measures
+        self.clock = clock
+
+        # all random numbers are drawn in vectorized form from the generator of the replicate
+        # they belong to (see draw), so that the results of a replicate do not depend on
+        # the other replicates of the batch
+        self.generators: List[np.random.Generator] = [rng.generator for rng in rngs]
+        assert len(self.generators) == len(worlds)
+
+        # number of agents of all replicates
+        self.n_agents = sum(world.n_agents for world in worlds)
+
+        #######################################################################
+        # replicates
+        #######################################################################
+
+        self.n_replicates = len(worlds)
+        self.n_agents_of_replicate = np.array([world.n_agents for world in worlds])
+        self.first_agent_of_replicate = np.cumsum(self.n_agents_of_replicate) - self.n_agents_of_replicate
+
+        # replicate of each agent
+        self.replicate = np.repeat(np.arange(self.n_replicates), self.n_agents_of_replicate)
+
+        #######################################################################
+        # rooms
+        #######################################################################
+
+        """
+        Each (cell, group)-combination of the worlds is mapped to one integer room-id.
+        The room-ids of a cell are stored consecutively, starting at room_offset[cell].
+        """
+
+        n_rooms_per_cell = np.concatenate([
+            np.maximum(world.get_location_array("n_groups"), 1) for world in worlds
+            ])
+        room_offset = np.concatenate(([0], np.cumsum(n_rooms_per_cell)[:-1]))
+
+        # infection probability of each room
+        infection_prob_of_location_type = np.zeros(max(location_dependend_infection_prob_dict) + 1)
+        for location_type, infection_prob in location_dependend_infection_prob_dict.items():
+            infection_prob_of_location_type[location_type] = infection_prob
+        self.infection_prob_of_room = np.repeat(
+            infection_prob_of_location_type[np.concatenate([world.get_location_array("location_type") for world in worlds])],
+            n_rooms_per_cell,
+            )
+
+        # index of the first cell of each replicate's world
+        n_cells_of_replicate = np.array([world.n_locations for world in worlds])
+        first_cell_of_replicate = np.cumsum(n_cells_of_replicate) - n_cells_of_replicate
+
+        # replicate of each room
+        self.replicate_of_room = np.repeat(
+            np.repeat(np.arange(len(worlds)), n_cells_of_replicate),
+            n_rooms_per_cell,
+            )
+
+        def rooms_of(name_of_cell_array, name_of_group_array = None):
+            """
+            Concatenates the rooms of an assigned location (see src.sim.assignment)
+            of the agents of all replicates (-1 = no such location).
+            """
+            rooms = []
+            for world, first_cell in zip(worlds, first_cell_of_replicate):
+                cell = getattr(world.assignment, name_of_cell_array)
+                group = 0 if name_of_group_array is None else getattr(world.assignment, name_of_group_array)
+                rooms.append(np.where(cell >= 0, room_offset[first_cell + cell] + group, -1))
+            return np.concatenate(rooms)
+
+        #######################################################################
+        # agent attributes
+        #######################################################################
+
+        def agent_array(attribute, dtype = None):
+            """Concatenates an attribute of the agents of all replicates."""
+            return np.concatenate([world.get_agent_array(attribute, dtype) for world in worlds])
+
+        self.age = agent_array("age")
+        self.p_sym = agent_array("p_sym")
+        self.student = agent_array("student").astype(bool)
+
+        # durations of the stages of infection
+        self.duration_s = agent_array("duration_s")
+        self.duration_i = agent_array("duration_i")
+        self.duration_r_a = agent_array("duration_r_a")
+        self.duration_r_m = agent_array("duration_r_m")
+
+        # work
+        self.work_hours_day_in_ticks = agent_array("work_hours_day_in_ticks", float)
+        self.worker = self.work_hours_day_in_ticks > 0
+        self.nace2 = agent_array("nace2")
+        self.nace2_short = agent_array("nace2_short")
+
+        # shopping
+        self.hours_at_supermarket_in_ticks = agent_array("hours_at_supermarket_in_ticks", float)
+
+        # households (the members of a household are consecutive)
+        self.household_size = np.concatenate([world.household_size for world in worlds])
+        self.household_start = np.cumsum(self.household_size) - self.household_size
+        self.household = np.repeat(np.arange(len(self.household_size)), self.household_size)
+
+        # rooms assigned to the agents
+        self.room_home = rooms_of("home_cell", "home_group")
+        self.room_work = rooms_of("work_cell", "work_group")
+        self.room_school = rooms_of("school_cell", "school_group")
+        self.room_kindergarten = rooms_of("kindergarten_cell")
+        self.room_university = rooms_of("university_cell")
+        self.room_supermarkets = rooms_of("supermarket_cells")
+
+        # the order of the "elif"-chain at 8 o'clock: workers, pupils, kindergarten kids
+        self.pupil = (self.room_school >= 0) & ~self.worker
+        self.kindergarten_kid = (self.room_kindergarten >= 0) & ~self.worker & ~self.pupil
+        self.shopper = self.age >= 14
+
+        #######################################################################
+        # agent states
+        #######################################################################
+
+        self.infection = np.full(self.n_agents, S, dtype=np.int8)
+        self.tick_of_exposure = np.full(self.n_agents, -1)
+        self.tick_of_infectivity = np.full(self.n_agents, -1)
+        self.tick_of_symptom_onset = np.full(self.n_agents, -1)
+        self.tick_of_quarantine = np.full(self.n_agents, -1)
+
+        self.stay_at_home = np.zeros(self.n_agents, dtype=bool)
+        self.quarantine = np.zeros(self.n_agents, dtype=bool)
+
+        # calendar queue of the upcoming transitions between states of infection
+        self.schedule = TransitionSchedule()
+
+        # calendar queue of the ends of the activities and
+        # the agents which have initialized an activity in the current tick
+        self.activity_ends = TransitionSchedule()
+        self.starting_agents: List[np.ndarray] = []
+
+        # number of agents per replicate and state of infection (updated on each transition)
+        self.compartment_counts = np.zeros((self.n_replicates, N_INFECTION_STATES), dtype=np.int64)
+        self.compartment_counts[:, S] = self.n_agents_of_replicate
+
+        # indices of the agents which are able to infect others (i, a, m)
+        self.infectious_agents = np.empty(0, dtype=np.int64)
+
+        # current room of each agent
+        self.room = self.room_home.copy()
+
+        # activities
+        self.activity = np.full(self.n_agents, NO_ACTIVITY, dtype=np.int8)
+        self.activity_len_in_ticks = np.zeros(self.n_agents)
+        self.tick_of_activity_end = np.full(self.n_agents, -1)
+        self.target_room = np.full(self.n_agents, -1)
+        self.been_at_university_today = np.zeros(self.n_agents, dtype=bool)
+        self.shopped_today = np.zeros(self.n_agents, dtype=bool)
+
+        # sorting of the agents by room (recomputed only if agents have moved)
+        # within each room, the susceptible agents come first
+        self.rooms_changed = True
+        self.agents_sorted_by_room = None
+        self.position_in_sorting = None
+        self.room_start = None
+        self.room_size = None
+        self.n_susceptible_in_room = None
+
+        # daily counters (one per replicate)
+        self.new_cases = np.zeros(self.n_replicates, dtype=np.int64)
+        self.cumulative_cases = np.zeros(self.n_replicates, dtype=np.int64)
+        self.new_cases_age = np.zeros(self.n_replicates, dtype=np.int64)
+        self.cumulative_cases_age = np.zeros(self.n_replicates, dtype=np.int64)
+        self.n_inf_age_0_29 = np.zeros(self.n_replicates, dtype=np.int64)
+        self.n_inf_age_30_59 = np.zeros(self.n_replicates, dtype=np.int64)
+        self.n_inf_age_60 = np.zeros(self.n_replicates, dtype=np.int64)
+
+
+    def draw(self, replicate: np.ndarray, distribution: str, *parameters) -> np.ndarray:
+        """
+        Draws one random number per element from the given distribution (a method of
+        np.random.Generator, e.g. "random" or "binomial"), each from the generator of the
+        element's replicate (replicate = replicate of each element). Array parameters
+        contain one value per element.
+        The elements of a replicate get their numbers in their order, so that the numbers
+        of a replicate do not depend on the other replicates of the batch.
+        """
+
+        if self.n_replicates == 1:
+            return getattr(self.generators[0], distribution)(*parameters, size=len(replicate))
+
+        values = None
+        order = np.argsort(replicate, kind="stable")
+        n_elements_of_replicate = np.bincount(replicate, minlength=self.n_replicates)
+        first = 0
+        for r, n_elements in enumerate(n_elements_of_replicate.tolist()):
+            if n_elements == 0:
+                continue
+            elements = order[first:first + n_elements]
+            first += n_elements
+            values_of_replicate = getattr(self.generators[r], distribution)(
+                *[parameter[elements] if np.ndim(parameter) > 0 else parameter for parameter in parameters],
+                size=n_elements,
+                )
+            if values is None:
+                values = np.empty(len(replicate), dtype=values_of_replicate.dtype)
+            values[elements] = values_of_replicate
+
+        if values is None:
+            return getattr(self.generators[0], distribution)(*parameters, size=0)
+        return values
+
+
+    def random(self, agents: np.ndarray) -> np.ndarray:
+        """Returns one uniform random number per agent (drawn from the generator of the agent's replicate)."""
+        return self.draw(self.replicate[agents], "random")
+
+
+    def count_by_replicate(self, agents: np.ndarray, weights: np.ndarray = None) -> np.ndarray:
+        """Returns the number of the given agents (or the sum of their weights) per replicate."""
+
+        counts = np.bincount(self.replicate[agents], weights=weights, minlength=self.n_replicates)
+        return counts.astype(np.int64)
+
+
+    def count_states_by_replicate(self, agents: np.ndarray) -> np.ndarray:
+        """Returns the number of the given agents per replicate and state of infection."""
+
+        index = self.replicate[agents] * N_INFECTION_STATES + self.infection[agents]
+        counts = np.bincount(index, minlength=self.n_replicates * N_INFECTION_STATES)
+        return counts.reshape(self.n_replicates, N_INFECTION_STATES)
+
+
+    def count_cases(self, agents: np.ndarray):
+        """Adds newly detected cases (agents turning symptomatic/asymptomatic) to the counters."""
+
+        ages = self.age[agents]
+
+        n_cases = self.count_by_replicate(agents)
+        self.new_cases += n_cases
+        self.cumulative_cases += n_cases
+
+        sum_of_ages = self.count_by_replicate(agents, weights=ages)
+        self.new_cases_age += sum_of_ages
+        self.cumulative_cases_age += sum_of_ages
+
+        self.n_inf_age_0_29 += self.count_by_replicate(agents[ages <= 29])
+        self.n_inf_age_30_59 += self.count_by_replicate(agents[(ages >= 30) & (ages <= 59)])
+        self.n_inf_age_60 += self.count_by_replicate(agents[ages >= 60])
+
+
+    def expose(self, agents: np.ndarray, tick: int):
+        """Exposes all susceptible agents of the given array."""
+
+        agents = np.unique(agents)
+        agents = agents[self.infection[agents] == S]
+        self.infection[agents] = E
+        self.tick_of_exposure[agents] = tick
+        self.schedule_next_transitions(agents)
+
+        # keep the susceptible agents at the beginning of their room in the sorting
+        if not self.rooms_changed:
+            self.remove_from_susceptibles_of_room(agents)
+
+        n_exposed = self.count_by_replicate(agents)
+        self.compartment_counts[:, S] -= n_exposed
+        self.compartment_counts[:, E] += n_exposed
+
+
+    def schedule_next_transitions(self, agents: np.ndarray):
+        """
+        Vectorized version of Agent.get_tick_of_next_transition().
+        Adds the next transitions of the given agents to the calendar queue.
+        """
+
+        if len(agents) == 0:
+            return
+
+        infection = self.infection[agents]
+        ticks = np.select(
+            [infection == E, infection == I, infection == A, infection == M],
+            [
+                self.tick_of_exposure[agents] + np.ceil(self.duration_s[agents]),
+                self.tick_of_infectivity[agents] + np.floor(self.duration_i[agents]) + 1,
+                self.tick_of_symptom_onset[agents] + np.floor(self.duration_r_a[agents]) + 1,
+                self.tick_of_symptom_onset[agents] + np.floor(self.duration_r_m[agents]) + 1,
+                ],
+            default = -1,
+            ).astype(np.int64)
+
+        self.schedule.add_array(agents[ticks >= 0], ticks[ticks >= 0])
+
+
+    def update_status_of_infection(self, tick: int):
+        """
+        Vectorized version of Agent.update_status_of_infection().
+        Only the agents whose transition is due in this tick are updated.
+        """
+
+        due = self.schedule.pop(tick)
+        if not due:
+            return
+        agents = np.concatenate(due)
+
+        infection = self.infection[agents]
+        self.compartment_counts -= self.count_states_by_replicate(agents)
+
+        # exposed agents become infectious
+        becomes_infectious = agents[infection == E]
+        self.infection[becomes_infectious] = I
+        self.tick_of_infectivity[becomes_infectious] = tick
+
+        # infectious agents become symptomatic or asymptomatic
+        develops_symptoms = agents[infection == I]
+        symptomatic = self.random(develops_symptoms) < self.p_sym[develops_symptoms]
+        self.infection[develops_symptoms] = np.where(symptomatic, M, A)
+        self.tick_of_symptom_onset[develops_symptoms] = tick
+        self.count_cases(develops_symptoms)
+
+        # symptomatic and asymptomatic agents recover
+        recovers = agents[(infection == A) | (infection == M)]
+        self.infection[recovers] = R
+
+        self.schedule_next_transitions(agents)
+        self.compartment_counts += self.count_states_by_replicate(agents)
+
+        # update the set of infectious agents
+        if len(recovers) > 0:
+            self.infectious_agents = self.infectious_agents[self.infection[self.infectious_agents] != R]
+        self.infectious_agents = np.concatenate((self.infectious_agents, becomes_infectious))
+
+
+    def sort_agents_by_room(self):
+        """
+        Sorts the agents by their current room so that the members of a room are adjacent
+        and the susceptible members of a room come first.
+        """
+
+        if self.rooms_changed:
+            n_rooms = len(self.infection_prob_of_room)
+            susceptible = self.infection == S
+            self.agents_sorted_by_room = np.argsort(self.room * 2 + ~susceptible, kind="stable")
+            self.room_size = np.bincount(self.room, minlength=n_rooms)
+            self.room_start = np.cumsum(self.room_size) - self.room_size
+            self.n_susceptible_in_room = np.bincount(self.room[susceptible], minlength=n_rooms)
+            self.position_in_sorting = np.empty(self.n_agents, dtype=np.int64)
+            self.position_in_sorting[self.agents_sorted_by_room] = np.arange(self.n_agents)
+            self.rooms_changed = False
+
+
+    def remove_from_susceptibles_of_room(self, agents: np.ndarray):
+        """
+        Moves agents which are no longer susceptible (already exposed) behind the susceptible
+        agents of their room. The susceptible agents of each affected room are partitioned
+        at once, so that the remaining susceptible agents of a room stay sorted by their
+        index, just like after sorting the agents again. Thus, the agents hit by the
+        transmitting contacts of a replicate do not depend on when the rooms are sorted
+        (which depends on all replicates of the batch).
+        """
+
+        if len(agents) == 0:
+            return
+
+        sorting = self.agents_sorted_by_room
+
+        # positions of the susceptible agents (before the exposure) of the affected rooms
+        rooms = np.unique(self.room[agents])
+        n_susceptible = self.n_susceptible_in_room[rooms]
+        first_member = np.cumsum(n_susceptible) - n_susceptible
+        positions = np.repeat(self.room_start[rooms] - first_member, n_susceptible) + np.arange(n_susceptible.sum())
+
+        # per room: the still susceptible agents first (in the order of their index), then the exposed agents
+        members = sorting[positions]
+        room_of_member = np.repeat(np.arange(len(rooms)), n_susceptible)
+        members = members[np.argsort(room_of_member * 2 + (self.infection[members] != S), kind="stable")]
+
+        sorting[positions] = members
+        self.position_in_sorting[members] = positions
+        np.subtract.at(self.n_susceptible_in_room, self.room[agents], 1)
+
+
+    def infect(self, tick: int):
+        """
+        Room-aggregated version of Agent.infect().
+        In Agent.infect(), each infectious agent meets one other agent of its room at random
+        and exposes it by the room's infection probability p if it is susceptible.
+        In a room with n agents, I infectious and S susceptible agents, the number of
+        transmitting contacts is therefore Binomial(I, p * S / (n - 1)) and each contact
+        hits one of the S susceptible agents at random. This is drawn once per room
+        containing infectious agents instead of once per infectious agent.
+        """
+
+        infectious = self.infectious_agents
+        if len(infectious) == 0:
+            return
+
+        self.sort_agents_by_room()
+
+        # rooms containing infectious agents and their number of infectious agents
+        rooms, n_infectious = np.unique(self.room[infectious], return_counts=True)
+        room_size = self.room_size[rooms]
+        n_susceptible = self.n_susceptible_in_room[rooms]
+
+        # only rooms in which infectious agents can meet susceptible agents
+        relevant = n_susceptible > 0
+        rooms = rooms[relevant]
+        n_infectious = n_infectious[relevant]
+        room_size = room_size[relevant]
+        n_susceptible = n_susceptible[relevant]
+
+        # number of transmitting contacts per room
+        p_transmission = self.infection_prob_of_room[rooms] * n_susceptible / (room_size - 1)
+        n_transmissions = self.draw(self.replicate_of_room[rooms], "binomial", n_infectious, p_transmission)
+
+        # each transmitting contact hits a random susceptible agent of the room
+        rooms = np.repeat(rooms, n_transmissions)
+        n_susceptible = np.repeat(n_susceptible, n_transmissions)
+        position = (self.draw(self.replicate_of_room[rooms], "random") * n_susceptible).astype(np.int64)
+        self.expose(self.agents_sorted_by_room[self.room_start[rooms] + position], tick)
+
+
+    def decide_to_stay_at_home(self, tick: int, phase: int):
+        """
+        Vectorized version of Agent.decide_to_stay_at_home() and
+        Agent.decide_to_isolate_household().
+        """
+
+        symptomatic = self.infection == M
+        self.stay_at_home = symptomatic & (tick - self.tick_of_symptom_onset >= self.model.n_ticks_per_day)
+
+        if self.measures.household_quarantine[phase]:
+
+            # isolate the households of agents that have had symptoms for a while
+            isolating = symptomatic & ~self.quarantine & (tick - self.tick_of_symptom_onset >= self.n_ticks_to_quarantine)
+            if isolating.any():
+                members = self.get_members_of_households(np.unique(self.household[isolating]))
+                self.quarantine[members] = True
+                self.tick_of_quarantine[members] = tick
+
+            # stay at home for 14 days (14 days * 18 daily ticks)
+            in_quarantine = self.quarantine & (tick - self.tick_of_quarantine < 252)
+            released = self.quarantine & ~in_quarantine
+            self.stay_at_home[in_quarantine] = True
+            self.stay_at_home[released] = False
+            self.quarantine[released] = False
+
+
+    def get_members_of_households(self, households: np.ndarray) -> np.ndarray:
+        """Returns the indices of all members of the given households."""
+
+        sizes = self.household_size[households]
+        first_member = np.cumsum(sizes) - sizes
+        return np.repeat(self.household_start[households] - first_member, sizes) + np.arange(sizes.sum())
+
+
+    def initialize_activity(self, agents: np.ndarray, activity: int, target_room: np.ndarray, activity_len_in_ticks):
+        """Vectorized version of Agent.initialize_activity()."""
+
+        self.activity[agents] = activity
+        self.target_room[agents] = target_room
+        self.activity_len_in_ticks[agents] = activity_len_in_ticks
+        self.starting_agents.append(agents)
+
+
+    def choose_activities(self, simulation_clock_time: int, phase: int):
+        """
+        Vectorized version of the activity decisions on workdays in Sim.internal_run().
+        """
+
+        model = self.model
+        measures = self.measures
+        free = ~self.stay_at_home
+
+        # at 8 o'clock
+        if simulation_clock_time == 8:
+
+            # workers
+            workers = np.flatnonzero(free & self.worker)
+
+            # "work at home" if "homeoffice" or "closure of workplace" or "short time work"
+            work_at_home = measures.draw_work_at_home(
+                phase,
+                self.nace2[workers],
+                self.nace2_short[workers],
+                lambda: self.random(workers),
+                )
+
+            self.initialize_activity(
+                workers,
+                AT_WORK,
+                np.where(work_at_home, self.room_home[workers], self.room_work[workers]),
+                self.work_hours_day_in_ticks[workers],
+                )
+
+            # pupils, if schools are open
+            pupils = np.flatnonzero(free & self.pupil)
+            pupils = pupils[self.random(pupils) < measures.school[phase]]
+            self.initialize_activity(pupils, AT_SCHOOL, self.room_school[pupils], model.n_ticks_at_school)
+
+            # kindergarten kids, if kindergartens are open
+            kids = np.flatnonzero(free & self.kindergarten_kid)
+            kids = kids[self.random(kids) < measures.kindergartens[phase]]
+            self.initialize_activity(kids, AT_KINDERGARTEN, self.room_kindergarten[kids], model.n_ticks_at_kindergarten)
+
+        if simulation_clock_time in model.day_time:
+
+            idle = free & (self.activity == NO_ACTIVITY)
+
+            # go to university
+            students = np.flatnonzero(idle & self.student)
+            students = students[
+                (self.random(students) < measures.university[phase]) &
+                ~self.been_at_university_today[students]
+                ]
+            self.initialize_activity(students, AT_UNIVERSITY, self.room_university[students], model.n_ticks_at_university)
+            self.been_at_university_today[students] = True
+
+            # go shopping, if the agent has not shopped today
+            shoppers = np.flatnonzero(idle & self.shopper)
+            shoppers = shoppers[self.random(shoppers) < measures.supermarkets[phase]]
+            shoppers = shoppers[~self.shopped_today[shoppers] & (self.activity[shoppers] == NO_ACTIVITY)]
+            supermarket = (self.random(shoppers) * self.room_supermarkets.shape[1]).astype(np.int64)
+            self.initialize_activity(
+                shoppers,
+                SHOPPING,
+                self.room_supermarkets[shoppers, supermarket],
+                self.hours_at_supermarket_in_ticks[shoppers],
+                )
+            self.shopped_today[shoppers] = True
+
+
+    def do_activity(self, tick: int):
+        """
+        Vectorized version of the movement in Sim.internal_run():
+        only the agents whose activity starts or ends in this tick are moved.
+        """
+
+        # agents whose activity ends in this tick go home
+        # (unless the activity has been replaced by a new one in the meantime)
+        ending = self.activity_ends.pop(tick)
+        if ending:
+            ending = np.concatenate(ending)
+            ending = ending[(self.tick_of_activity_end[ending] == tick) & (self.target_room[ending] < 0)]
+            self.stop_activity(ending)
+
+        # agents which have initialized an activity go to its location
+        starting = np.concatenate(self.starting_agents) if self.starting_agents else []
+        self.starting_agents = []
+        if len(starting) > 0:
+            self.room[starting] = self.target_room[starting]
+            self.target_room[starting] = -1
+            self.rooms_changed = True
+
+            # the activity is stopped when the planned execution time has been reached
+            tick_of_activity_end = tick + np.maximum(np.ceil(self.activity_len_in_ticks[starting]), 0).astype(np.int64)
+            self.tick_of_activity_end[starting] = tick_of_activity_end
+            stopping_now = tick_of_activity_end == tick
+            self.stop_activity(starting[stopping_now])
+            self.activity_ends.add_array(starting[~stopping_now], tick_of_activity_end[~stopping_now])
+
+
+    def stop_activity(self, agents: np.ndarray):
+        """Stops the activities of the agents, who go home."""
+
+        if len(agents) > 0:
+            self.room[agents] = self.room_home[agents]
+            self.activity[agents] = NO_ACTIVITY
+            self.tick_of_activity_end[agents] = -1
+            self.rooms_changed = True
+
+
+    def advance(self, tick: int, simulation_clock_time: int, weekday: int, phase: int):
+        """Simulates one tick."""
+
+        self.update_status_of_infection(tick)
+
+        self.infect(tick)
+
+        self.decide_to_stay_at_home(tick, phase)
+
+        # on workdays
+        if weekday < 5:
+            self.choose_activities(simulation_clock_time, phase)
+
+        self.do_activity(tick)
+
+
+    def run(
+            self,
+            simulation_run: int,
+            n_initial_infections: int,
+            n_random_infections,
+            ) -> List[Tuple[List[dict], List[int]]]:
+        """
+        Runs the simulation loop.
+        Returns for each replicate the daily output data and the ages of all infected agents.
+        """
+
+        model = self.model
+        clock = self.clock
+        replicates = range(self.n_replicates)
+
+        #######################################################################
+        # initial infections & first count
+        #######################################################################
+
+        output_data = [[] for r in replicates]
+
+        infected_agents = np.concatenate([
+            first_agent + generator.choice(n_agents, n_initial_infections, replace=False)
+            for first_agent, n_agents, generator in zip(self.first_agent_of_replicate, self.n_agents_of_replicate, self.generators)
+            ])
+        self.infection[infected_agents] = I
+        self.tick_of_infectivity[infected_agents] = 0
+        self.tick_of_exposure[infected_agents] = 0
+        self.count_cases(infected_agents)
+        self.schedule_next_transitions(infected_agents)
+        self.compartment_counts[:, S] -= n_initial_infections
+        self.compartment_counts[:, I] += n_initial_infections
+        self.infectious_agents = infected_agents
+
+        for r in replicates:
+            output_data[r].append(self.get_todays_infection_data(r, simulation_run, 0, 0, model.start_datetime))
+            output_data[r][0]["new_cases"] = 50
+            output_data[r][0]["cumulative_cases"] = 50
+
+        # reset daily case numbers
+        self.new_cases[:] = 0
+        self.new_cases_age[:] = 0
+
+        #######################################################################
+        # simulation loop
+        #######################################################################
+
+        simulate = True
+
+        # first tick which has not been simulated yet
+        self.next_tick_to_simulate = 0
+
+        for tick in range(clock.n_ticks):
+
+            simulation_clock_time = clock.hour[tick]
+            weekday = clock.weekday[tick]
+            phase = clock.phase[tick]
+
+            # when a new day begins
+            if clock.new_day[tick]:
+
+                # collect data
+                for r in replicates:
+                    output_data[r].append(self.get_todays_infection_data(r, simulation_run, tick, clock.day[tick], clock.datetime[tick]))
+
+                self.new_cases[:] = 0
+                self.new_cases_age[:] = 0
+
+                n_infectious = self.compartment_counts[:, E:M + 1].sum(axis=1)
+
+                # if the virus is dead in all replicates, stop the simulation
+                # (replicates in which the virus is dead do not change anymore)
+                if (n_infectious == 0).all() and n_random_infections == 0:
+                    simulate = False
+
+                # empty agents' list of activities done today
+                self.been_at_university_today[:] = False
+                self.shopped_today[:] = False
+
+                # random infections (in each replicate)
+                if n_random_infections < 1:
+                    n_new_infections = (np.array([generator.random() for generator in self.generators]) < n_random_infections).astype(np.int64)
+                else:
+                    n_new_infections = np.full(self.n_replicates, round(n_random_infections))
+
+                replicate = np.repeat(np.arange(self.n_replicates), n_new_infections)
+                self.expose(
+                    self.first_agent_of_replicate[replicate] + self.draw(replicate, "integers", 0, self.n_agents_of_replicate[replicate]),
+                    tick,
+                    )
+
+            # (ticks which have already been simulated by a previous call of advance() are skipped)
+            if simulate and tick >= self.next_tick_to_simulate:
+                self.advance(tick, simulation_clock_time, weekday, phase)
+
+        infected = self.infection != S
+
+        return [
+            (output_data[r], list(self.age[infected & (self.replicate == r)]))
+            for r in replicates
+            ]
+
+
+    def get_todays_infection_data(self, replicate: int, simulation_run: int, tick: int, simulation_day: int, current_datetime) -> dict:
+        """Returns the output data of the current day of one replicate."""
+
+        return {
+            "group": self.model.state,
+            "run": simulation_run,
+            "tick": tick,
+            "day": simulation_day,
+            "datetime": current_datetime,
+            "new_cases": int(self.new_cases[replicate]),
+            "cumulative_cases": int(self.cumulative_cases[replicate]),
+            "new_cases_age": int(self.new_cases_age[replicate]),
+            "cumulative_cases_age": int(self.cumulative_cases_age[replicate]),
+            "n_inf_age_0_29" : int(self.n_inf_age_0_29[replicate]),
+            "n_inf_age_30_59": int(self.n_inf_age_30_59[replicate]),
+            "n_inf_age_60": int(self.n_inf_age_60[replicate]),
+            "scale_to_100k": 100000 / self.n_agents_of_replicate[replicate],
+            }
@@ -0,0 +1,229 @@
+from typing import Dict, List
+
+import numpy as np
+
+from src.sim.cell import Cell
+from src.sim.codes import *
+from src.sim.world import World
+
+
+class InstitutionAssignment:
+    """
+    Assignment of the agents of a world to their locations (homes, supermarkets,
+    schools and classes, kindergartens, workplaces and divisions, universities).
+    Instead of looping over all agents once per type of location, the assignment is
+    drawn in a few vectorized steps on arrays of agent attributes.
+    The result is stored in compact arrays (one entry per agent in the order of
+    world.agents["agents"]), which contain the index of the cell in
+    world.locations (-1 = no such location) and the group/room within the cell.
+    These arrays can be used directly by the ArrayEngine.
+    Afterwards, the assignment is also written to the Agent- and Cell-objects,
+    which are used by the agent-based simulation loop.
+    """
+
+    def __init__(
+            self,
+            world: World,
+            school_age: range,
+            kindergarten_age: range,
+            pupils_per_class: int,
+            n_colleagues: int,
+            n_fav_supermarkets: int,
+            generator: np.random.Generator,
+            ):
+
+        agents = world.agents["agents"]
+        n_agents = len(agents)
+        self.generator = generator
+
+        # index of cells in world.locations
+        def cell_indices(cells: List[Cell]) -> np.ndarray:
+            return np.array([cell.location_id for cell in cells], dtype=np.int64)
+
+        # agent attributes
+        age = np.array([agent.age for agent in agents])
+        worker = np.array([agent.work_hours_day_in_ticks > 0 for agent in agents])
+        nace2_short = np.array([agent.nace2_short for agent in agents])
+        student = np.array([agent.student == 1 for agent in agents])
+
+        #######################################################################
+        # homes (already assigned household by household)
+        #######################################################################
+
+        self.home_cell = np.array([agent.home_cell.location_id for agent in agents], dtype=np.int64)
+        self.home_group = np.array([agent.groups[HOME] for agent in agents], dtype=np.int64)
+
+        #######################################################################
+        # supermarkets
+        #######################################################################
+
+        # each agent has n_fav_supermarkets random favourite supermarkets
+        supermarkets = cell_indices(world.get_cells_of_type("supermarket"))
+        self.supermarket_cells = supermarkets[
+            generator.integers(0, len(supermarkets), (n_agents, n_fav_supermarkets))
+            ]
+
+        #######################################################################
+        # schools and classes
+        #######################################################################
+
+        # each pupil attends a random school and a random class within the school
+        pupils = np.flatnonzero((age >= school_age.start) & (age < school_age.stop))
+        schools = np.sort(cell_indices(world.get_cells_of_type("school")))
+        self.school_cell, self.school_group, school_n_users, school_n_groups = self.assign_to_groups(
+            pupils, self.choose(schools, len(pupils)), schools, n_agents, pupils_per_class,
+            )
+
+        #######################################################################
+        # kindergartens
+        #######################################################################
+
+        # each kindergarten kid attends a random kindergarten (group)
+        kindergarten_kids = np.flatnonzero((age >= kindergarten_age.start) & (age < kindergarten_age.stop))
+        kindergartens = cell_indices(world.get_cells_of_type("kindergarten"))
+        self.kindergarten_cell = np.full(n_agents, -1, dtype=np.int64)
+        self.kindergarten_cell[kindergarten_kids] = self.choose(kindergartens, len(kindergarten_kids))
+
+        #######################################################################
+        # workplaces and divisions
+        #######################################################################
+
+        """
+        Each worker works in a random firm of the worker's NACE2-section and in a random
+        division of the firm. The firms are grouped by section once (firms_of_section),
+        so that the firms of all workers can be drawn at once.
+        """
+
+        firm_types = [cell_type for cell_type in world.cells_by_type if "firm" in cell_type]
+        sections = np.array([int(cell_type[len("firm"):]) for cell_type in firm_types], dtype=np.int64)
+        n_firms_of_section = np.zeros(max(sections.max(), nace2_short.max()) + 1, dtype=np.int64)
+        n_firms_of_section[sections] = [len(world.get_cells_of_type(cell_type)) for cell_type in firm_types]
+        first_firm_of_section = np.cumsum(n_firms_of_section) - n_firms_of_section
+        firms_of_section = np.zeros(n_firms_of_section.sum(), dtype=np.int64)
+        for section, cell_type in zip(sections, firm_types):
+            first_firm = first_firm_of_section[section]
+            firms_of_section[first_firm:first_firm + n_firms_of_section[section]] = cell_indices(world.get_cells_of_type(cell_type))
+
+        workers = np.flatnonzero(worker)
+        section_of_worker = nace2_short[workers]
+        assert (n_firms_of_section[section_of_worker] > 0).all(), "there is no firm for a NACE2-section of a worker"
+        work_places = firms_of_section[
+            first_firm_of_section[section_of_worker]
+            + (generator.random(len(workers)) * n_firms_of_section[section_of_worker]).astype(np.int64)
+            ]
+        firms = np.sort(firms_of_section)
+        self.work_cell, self.work_group, firm_n_users, firm_n_groups = self.assign_to_groups(
+            workers, work_places, firms, n_agents, n_colleagues,
+            )
+
+        #######################################################################
+        # universities
+        #######################################################################
+
+        # each student attends a random university
+        students = np.flatnonzero(student)
+        universities = cell_indices(world.get_cells_of_type("university"))
+        self.university_cell = np.full(n_agents, -1, dtype=np.int64)
+        self.university_cell[students] = self.choose(universities, len(students))
+
+        #######################################################################
+        # write the assignment to the objects
+        #######################################################################
+
+        cells = world.locations
+
+        for cell, n_users, n_groups in zip(schools.tolist(), school_n_users.tolist(), school_n_groups.tolist()):
+            cells[cell].n_users = n_users
+            cells[cell].n_groups = n_groups
+
+        for cell, n_users, n_groups in zip(firms.tolist(), firm_n_users.tolist(), firm_n_groups.tolist()):
+            cells[cell].n_users = n_users
+            cells[cell].n_groups = n_groups
+
+        self.write_to_agents(agents, cells)
+
+
+    # arrays of the assignment (see WorldCache)
+    arrays = (
+        "home_cell",
+        "home_group",
+        "supermarket_cells",
+        "school_cell",
+        "school_group",
+        "kindergarten_cell",
+        "work_cell",
+        "work_group",
+        "university_cell",
+        )
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "InstitutionAssignment":
+        """Returns an (already drawn) assignment consisting of the given arrays."""
+        assignment = cls.__new__(cls)
+        for name in cls.arrays:
+            setattr(assignment, name, arrays[name])
+        return assignment
+
+
+    def write_to_agents(self, agents: list, cells: List[Cell]):
+        """Writes the assignment (except the homes) to the Agent-objects."""
+
+        for agent, supermarket_cells, school, school_group, kindergarten, work_place, work_group, university in zip(
+                agents,
+                self.supermarket_cells.tolist(),
+                self.school_cell.tolist(),
+                self.school_group.tolist(),
+                self.kindergarten_cell.tolist(),
+                self.work_cell.tolist(),
+                self.work_group.tolist(),
+                self.university_cell.tolist(),
+                ):
+            agent.fav_supermarkets = [cells[cell] for cell in supermarket_cells]
+            agent.groups[SUPERMARKET] = 0
+            if school >= 0:
+                agent.school = cells[school]
+                agent.groups[SCHOOL] = school_group
+            if kindergarten >= 0:
+                agent.kindergarten = cells[kindergarten]
+                agent.groups[KINDERGARTEN] = 0
+            if work_place >= 0:
+                agent.work_place = cells[work_place]
+                agent.groups[FIRM] = work_group
+            if university >= 0:
+                agent.university = cells[university]
+                agent.groups[UNIVERSITY] = 0
+
+
+    def choose(self, locations: np.ndarray, n: int) -> np.ndarray:
+        """Returns n random elements of the array of locations."""
+        return locations[self.generator.integers(0, len(locations), n)]
+
+
+    def assign_to_groups(
+            self,
+            users: np.ndarray,
+            location_of_user: np.ndarray,
+            all_locations: np.ndarray,
+            n_agents: int,
+            users_per_group: int,
+            ):
+        """
+        Assigns the users to their (already chosen) locations and to a random group
+        within the location. The number of groups of a location is the number of its
+        users divided by users_per_group (min. 1).
+
+        all_locations has to be sorted and contain the locations of all users.
+        Returns the cell and the group of each agent (-1 = none) as well as the number
+        of users and groups of each location of all_locations.
+        """
+        locations = location_of_user
+        location_of_user = np.searchsorted(all_locations, locations)
+        n_users = np.bincount(location_of_user, minlength=len(all_locations))
+        n_groups = np.maximum(n_users // users_per_group, 1)
+
+        cell = np.full(n_agents, -1, dtype=np.int64)
+        group = np.full(n_agents, -1, dtype=np.int64)
+        cell[users] = locations
+        group[users] = (self.generator.random(len(users)) * n_groups[location_of_user]).astype(np.int64)
+
+        return cell, group, n_users, n_groups
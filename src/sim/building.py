@@ -1,6 +1,8 @@
-import random
-from typing import List, Optional
+from typing import Optional
 from src.sim.cell import Cell
+from src.sim.codes import get_location_type
+from src.sim.rng import RandomNumbers
+from src.sim.world import World
 
 class Building:
     def __init__(
@@ -26,36 +28,32 @@ class Building:
             self,
             building_x_origin: int,
             building_y_origin: int,
-            grid_as_matrix: List[List[Cell]],
+            world: World,
 
     ):
         # for each cell of the building ground
         for y in range(building_y_origin, building_y_origin + self.n_cells_y_dim):
             for x in range(building_x_origin, building_x_origin + self.n_cells_x_dim):
 
+                cell = world.grid_as_matrix[y][x]
+
                 # build the building on cell
-                grid_as_matrix[y][x].walkable = False
-                grid_as_matrix[y][x].building = self
-                grid_as_matrix[y][x].cell_type = self.building_type
+                cell.building = self
+                world.change_cell_type(cell, self.building_type)
+                cell.location_type = get_location_type(self.building_type)
 
-                self.cells.append(grid_as_matrix[y][x])
+                self.cells.append(cell)
 
 
     def build_it_on_random_position(
             self,
-            grid_as_flat_list: List[Cell],
-            grid_as_matrix: List[List[Cell]],
+            world: World,
+            rng: RandomNumbers,
     ):
-        vacant_ground = [
-            cell
-            for cell in grid_as_flat_list
-            if cell.cell_type == "street"
-            ]
-        
-        building_ground = random.choice(vacant_ground)
+        building_ground = rng.choice(world.get_vacant_ground())
         
         self.build_it(
             building_ground.x_grid_pos, 
             building_ground.y_grid_pos, 
-            grid_as_matrix,
-            )
\ No newline at end of file
+            world,
+            )
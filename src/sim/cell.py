@@ -1,29 +1,48 @@
-from typing import Optional, List
+from typing import Optional
 
+from src.sim.codes import STREET
 
 
 class Cell:
+    
+    # fixed set of attributes instead of a __dict__ per cell
+    __slots__ = (
+        "location_id",
+        "x_grid_pos",
+        "y_grid_pos",
+        "rooms",
+        "cell_type",
+        "location_type",
+        "building",
+        "n_users",
+        "n_groups",
+        )
+    
     def __init__(
             self,
-            x_grid_pos: int,
-            y_grid_pos: int,
+            x_grid_pos: Optional[int] = None,
+            y_grid_pos: Optional[int] = None,
             ):
         
-        # x-coordinate on grid
+        # id of the location (position in World.locations)
+        self.location_id: Optional[int] = None
+        
+        # x-coordinate on grid (None, if the world has no grid)
         self.x_grid_pos: int = x_grid_pos
         
-        # y-coordinate on grid
+        # y-coordinate on grid (None, if the world has no grid)
         self.y_grid_pos: int = y_grid_pos
 
-        # Can agents enter this cell? (Does not matter because the modelling of walking has been removed.)
-        self.walkable: bool = True
-
-        # agents on that cell
-        self.dict_of_residents: dict = {}  
+        # agents on that cell by group/room
+        # key = group/room; value = list of agents (see Agent.move_in() and Agent.move_out())
+        self.rooms: dict = {}
 
         # type of location
         self.cell_type: str = "street"
         
+        # integer type of location (see src.sim.codes)
+        self.location_type: int = STREET
+        
         # Is there a building on the cell?
         self.building = None
         
@@ -0,0 +1,71 @@
+# Integer codes used instead of strings for the states of infection,
+# the types of locations and the activities of the agents.
+
+
+#######################################################################
+# SEIR-states
+#######################################################################
+
+S = 0   # susceptible
+E = 1   # exposed
+I = 2   # infectious
+A = 3   # asymptomatic infectious
+M = 4   # infectious with mild symptoms
+R = 5   # recovered
+
+N_INFECTION_STATES = 6
+
+INFECTION_LABELS = ("s", "e", "i", "a", "m", "r")
+
+
+#######################################################################
+# location types
+#######################################################################
+
+STREET = 0
+HOME = 1
+SUPERMARKET = 2
+SCHOOL = 3
+KINDERGARTEN = 4
+UNIVERSITY = 5
+FIRM = 6
+
+N_LOCATION_TYPES = 7
+
+LOCATION_TYPES = {
+    "street": STREET,
+    "home": HOME,
+    "supermarket": SUPERMARKET,
+    "school": SCHOOL,
+    "kindergarten": KINDERGARTEN,
+    "university": UNIVERSITY,
+    "firm": FIRM,
+    }
+
+
+def get_location_type(cell_type: str) -> int:
+    """
+    Returns the integer location type of a cell type.
+    All firms ("firm1", ..., "firm21") share the location type FIRM,
+    because each agent works in only one firm.
+    """
+    if cell_type.startswith("firm"):
+        return FIRM
+    return LOCATION_TYPES[cell_type]
+
+
+#######################################################################
+# activities
+#######################################################################
+
+NO_ACTIVITY = 0
+AT_WORK = 1
+AT_SCHOOL = 2
+AT_KINDERGARTEN = 3
+AT_UNIVERSITY = 4
+SHOPPING = 5
+
+
+def get_activity_flag(activity: int) -> int:
+    """Returns the bit of an activity in the bit field of activities done today."""
+    return 1 << activity
@@ -0,0 +1,68 @@
+import time
+from typing import List, Tuple
+
+from mpire import WorkerPool
+
+from src.sim.sim import Sim
+
+
+def scenario_task(models: List[Sim], task_function, model: int, scenario: int, **kwargs) -> Tuple[int, float, int, List[dict]]:
+    """Processes one task of a scenario in a worker process (see run_scenarios) and returns the time it started."""
+    start_time = time.time()
+    return (scenario, start_time) + task_function(models[model], **kwargs)
+
+
+def run_scenarios(scenarios: List[Tuple[Sim, list]], n_cores: int) -> List[dict]:
+    
+    """
+    Runs several scenarios (pairs of a model and a list of parameter values, see Sim.run)
+    on one pool of n_cores worker processes.
+    Instead of running the scenarios one after another, which leaves cores idle while
+    the last replications of a scenario are running, the tasks (replications) of all
+    scenarios form a single queue. The models of all scenarios (e.g. of several federal
+    states) are shared with the workers once.
+    The outputs of the tasks are collected as they arrive. As soon as all tasks of a
+    scenario are done, the output of the scenario is created (and saved on disk) exactly
+    like by Sim.run. Returns the outputs of the scenarios in the given order.
+    The computation time of a scenario (columns "start_time", "end_time" and "duration_time")
+    is measured from the start of its first task until its output is created.
+    """
+    
+    # distinct models of the scenarios
+    models = []
+    for model, params in scenarios:
+        if not any(model is other for other in models):
+            models.append(model)
+    
+    # tasks of all scenarios (scenario by scenario, so that the first scenarios are done first)
+    # & the collectors of their outputs
+    collectors = []
+    tasks = []
+    for scenario, (model, params) in enumerate(scenarios):
+        task_function, model_tasks, collector = model.prepare_run(params)
+        collectors.append(collector)
+        model_index = next(i for i, other in enumerate(models) if other is model)
+        tasks.extend(
+            dict(arguments, task_function=task_function, model=model_index, scenario=scenario)
+            for arguments in model_tasks
+            )
+    
+    outputs = [None] * len(scenarios)
+    
+    # time when the first task of each scenario started
+    start_times = [None] * len(scenarios)
+    
+    shared_models = [model.get_shared_model() for model in models]
+    with WorkerPool(n_jobs=n_cores, shared_objects=shared_models, start_method=models[0].start_method) as pool:
+        for scenario, start_time, task, task_outputs in pool.imap_unordered(scenario_task, tasks, chunk_size=1):
+            collectors[scenario].add(task, task_outputs)
+            if start_times[scenario] is None or start_time < start_times[scenario]:
+                start_times[scenario] = start_time
+            
+            # create the output of a completed scenario
+            if collectors[scenario].is_complete():
+                model = scenarios[scenario][0]
+                outputs[scenario] = model.collect_run(collectors[scenario], start_times[scenario])
+                collectors[scenario] = None
+    
+    return outputs
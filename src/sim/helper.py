@@ -1,6 +1,7 @@
 import datetime
 import math
 import random
+import sys
 from typing import List, Optional
 
 import pandas as pd
@@ -31,4 +32,31 @@ def random_color(*args):
     g = random.randint(5, 250)
     b = random.randint(5, 250)
     color = (r, g, b)
-    return color
\ No newline at end of file
+    return color
+
+def get_bytes_per_agent(agents: list) -> float:
+    """
+    Returns the average number of bytes occupied by one agent.
+    Counted are the agent object itself and the lists and numbers owned by the agent.
+    Objects shared with other agents (cells, other agents, cached small integers) are not counted.
+    """
+    def size_of_value(value):
+        if value is None or isinstance(value, bool):
+            return 0
+        if isinstance(value, int) and -5 <= value <= 256:
+            return 0
+        if isinstance(value, (int, float)):
+            return sys.getsizeof(value)
+        if isinstance(value, list):
+            return sys.getsizeof(value) + sum(
+                size_of_value(item) for item in value if isinstance(item, (int, float))
+                )
+        return 0
+
+    n_bytes = 0
+    for agent in agents:
+        n_bytes += sys.getsizeof(agent)
+        for attribute in type(agent).__slots__:
+            n_bytes += size_of_value(getattr(agent, attribute, None))
+
+    return n_bytes / len(agents)
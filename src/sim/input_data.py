@@ -0,0 +1,313 @@
+import datetime as dt
+import hashlib
+import os
+from pathlib import Path
+import pickle
+import tempfile
+from typing import Any, Callable, List, Tuple
+
+import pandas as pd
+
+import src
+from src.sim.helper import dates_between
+from src.sim.population import SoepHouseholds
+
+
+class InputData:
+    """
+    Prepared input data of the model (data on schools, kindergartens, work from home,
+    closed workplaces, reduced work hours, SOEP, population and infections).
+    Parsing the Excel- and CSV-files and preparing the data (e.g. the evaluation data
+    computed from the RKI-data) takes seconds, so each prepared item is stored once as
+    a pickle-file in the directory of prepared data and loaded from there afterwards.
+    Items depending on the federal state (or on the number of simulated days) are stored
+    per state (and number of days).
+    Each pickle-file contains a stamp of its source files (modification time, size and
+    hash of the content). The item is prepared again as soon as a source file has changed.
+    """
+
+    # version of the prepared data (to be increased if the preparation of an item changes)
+    version = 2
+
+    # number of rows of the RKI-data read at once
+    chunksize = 500000
+
+    def __init__(self, directory: Path = Path.joinpath(src.PATH, "data", "prepared")):
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # source files
+        self.germany = Path.joinpath(src.PATH, "data", "germany")
+        self.soep_file = Path.joinpath(src.PATH, "data", "soep4sim", "soep_for_corona_simulation.csv")
+        self.rki_file = Path.joinpath(self.germany, "RKI_COVID19_neu.csv")
+
+
+    #######################################################################
+    # cache
+    #######################################################################
+
+    @staticmethod
+    def get_hash(source: Path) -> str:
+        """Returns the hash of the content of the file."""
+
+        digest = hashlib.sha1()
+        with open(source, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+
+    def is_up_to_date(self, stamp: List[Tuple[str, int, int, str]]) -> bool:
+        """
+        Checks whether the source files are unchanged since the stamp was taken.
+        Files with a new modification time (e.g. after a checkout) are compared by their hash.
+        """
+
+        for source, mtime, size, content_hash in stamp:
+            status = os.stat(source)
+            if status.st_size != size:
+                return False
+            if status.st_mtime_ns != mtime and self.get_hash(Path(source)) != content_hash:
+                return False
+        return True
+
+
+    def get_stamp(self, sources: List[Path]) -> List[Tuple[str, int, int, str]]:
+        """Returns the stamp of the source files (path, modification time, size, hash)."""
+        return [
+            (str(source), os.stat(source).st_mtime_ns, os.stat(source).st_size, self.get_hash(source))
+            for source in sources
+            ]
+
+
+    def get(self, name: str, sources: List[Path], prepare: Callable[[], Any]) -> Any:
+        """
+        Returns the prepared item with the given name.
+        If it is not stored or its source files have changed, it is prepared by calling
+        prepare() and stored.
+        """
+
+        path = self.directory / (name + ".pkl")
+
+        # load the stored item
+        if path.is_file():
+            try:
+                with open(path, "rb") as file:
+                    version, stamp, item = pickle.load(file)
+                if version == self.version and self.is_up_to_date(stamp):
+                    # renew the stamp of touched but unchanged source files (to avoid hashing them again)
+                    if any(os.stat(source).st_mtime_ns != mtime for source, mtime, size, content_hash in stamp):
+                        self.save(path, self.get_stamp(sources), item)
+                    return item
+            except (OSError, EOFError, pickle.UnpicklingError, ValueError, AttributeError):
+                pass
+
+        # prepare the item
+        stamp = self.get_stamp(sources)
+        item = prepare()
+        self.save(path, stamp, item)
+
+        return item
+
+
+    def save(self, path: Path, stamp: List[Tuple[str, int, int, str]], item: Any):
+        """Stores the item together with the stamp of its source files."""
+
+        # write to a temporary file first, so that other processes never read an incomplete file
+        handle, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as file:
+                pickle.dump((self.version, stamp, item), file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, path)
+        except OSError:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+
+    #######################################################################
+    # items
+    #######################################################################
+
+    def read_csv(self, source: Path) -> pd.DataFrame:
+        """Returns the content of a CSV-file."""
+        return self.get(source.stem, [source], lambda: pd.read_csv(source))
+
+
+    def read_excel(self, source: Path) -> pd.DataFrame:
+        """Returns the content of an Excel-file."""
+        return self.get(source.stem, [source], lambda: pd.read_excel(source))
+
+
+    def get_school_data(self) -> pd.DataFrame:
+        """Returns the data on schools per federal state."""
+
+        school_data = self.read_excel(Path.joinpath(self.germany, "schools.xlsx"))
+        school_data["pupils/school"] = school_data["pupils"] // school_data["schools"]
+        school_data["pupils/class"] = school_data["pupils"] // school_data["classes"]
+        school_data["classes/school"] = school_data["classes"] // school_data["schools"]
+        return school_data.set_index(school_data["state"])
+
+
+    def get_kids_per_kindergarten(self, state_name: str) -> int:
+        """Returns the average number of kids per kindergarten-group in the federal state."""
+
+        kids_per_kindergarten = self.read_excel(Path.joinpath(self.germany, "kindergarten_group_size.xlsx"))
+        kids_per_kindergarten = kids_per_kindergarten.set_index("state")
+        return int(kids_per_kindergarten.loc[state_name, "kindergarten_group_size"])
+
+
+    def get_wfh_data(self) -> pd.DataFrame:
+        """Returns the data on work from home per NACE2-division."""
+
+        wfh_data = self.read_csv(Path.joinpath(self.germany, "wfh_nace2.csv"))
+        wfh_data = wfh_data.set_index("nace2")
+        wfh_data["wfh_freq"] = wfh_data["wfh_freq"] / 100
+        wfh_data["wfh_feas"] = wfh_data["wfh_feas"] / 100
+        return wfh_data
+
+
+    def get_nace2_lockdown_data(self) -> pd.DataFrame:
+        """Returns the data on closed workplaces per NACE2-section."""
+
+        nace2_lockdown_data = self.read_csv(Path.joinpath(self.germany, "nace2_lockdown.csv"))
+        return nace2_lockdown_data.set_index("nace2_short")
+
+
+    def get_nace2_short_reduction_of_workhours(self) -> pd.DataFrame:
+        """Returns the data on reduced work hours per NACE2-section."""
+
+        nace2_short_reduction_of_workhours = self.read_excel(Path.joinpath(self.germany, "nace2_short_reduction_of_workhours.xlsx"))
+        nace2_short_reduction_of_workhours["quarter2"] = nace2_short_reduction_of_workhours["quarter2"] / (-100)
+        return nace2_short_reduction_of_workhours.set_index("nace2_short")
+
+
+    def get_soep(self, state: int) -> Tuple[pd.DataFrame, SoepHouseholds]:
+        """Returns the SOEP-data of the federal state and its households grouped for sampling."""
+
+        def prepare():
+            soep = pd.read_csv(self.soep_file)
+            soep = soep[soep["federal_state"] == state]
+            return soep, SoepHouseholds(soep)
+
+        return self.get("soep_" + str(state), [self.soep_file], prepare)
+
+
+    def get_population_data(self) -> pd.DataFrame:
+        """Returns the data on the population size per federal state."""
+
+        population_data = self.read_excel(Path.joinpath(self.germany, "population_data.xlsx"))
+        population_data["scale_to_100k"] = 100000 / population_data["population"]
+        return population_data
+
+
+    def read_daily_cases(self, state_german: str) -> pd.DataFrame:
+        """
+        Returns the daily number of reported cases (RKI-data) of the federal state.
+        The file is read in chunks of only the needed columns. Each chunk is filtered by
+        the state and aggregated by date right away, so that the memory needed does not
+        grow with the size of the file.
+        """
+
+        cases_per_date = []
+        for chunk in pd.read_csv(
+                self.rki_file,
+                usecols=["Meldedatum", "Bundesland", "AnzahlFall"],
+                dtype={"Meldedatum": str, "Bundesland": str, "AnzahlFall": "int64"},
+                chunksize=self.chunksize,
+                ):
+            chunk = chunk[chunk["Bundesland"] == state_german]
+            cases_per_date.append(chunk.groupby("Meldedatum")["AnzahlFall"].sum())
+
+        # aggregate the chunks & parse the (few distinct) dates at once
+        cases = pd.concat(cases_per_date).groupby(level=0).sum()
+        cases.index = pd.to_datetime(cases.index)
+
+        dfs = (cases
+               .groupby(level=0)
+               .sum()
+               .rename_axis("Meldedatum")
+               .reset_index()
+               )
+        dfs.insert(1, "Bundesland", state_german)
+
+        return dfs
+
+
+    def get_eval_data(self, state: int, state_german: str, n_simulated_days: int) -> Tuple[List[float], pd.DataFrame, pd.Timestamp, pd.Timestamp]:
+        """
+        Returns the evaluation data for model calibration of the federal state
+        (the list of empirical cumulative cases per 100k inhabitants and the dataframe
+        of evaluation data) as well as the first and the last date of the simulation.
+        """
+
+        def prepare():
+            population_data = self.get_population_data()
+
+            # load daily infections of the state ("dfs" = "df_state")
+            dfs = self.read_daily_cases(state_german)
+
+            # get daily cumulative cases
+            dfs["cumulative_cases"] = dfs["AnzahlFall"].cumsum()
+
+            # get date from datetime
+            dfs["date"] = dfs["Meldedatum"].dt.date
+
+            # create a list of dates within the relevant period of time
+            dates = dates_between(dt.date(2020,3,1), dt.date(2020,9,15))
+
+            # create a new dataframe with the list of dates
+            dfs_eval = pd.DataFrame({"date": dates})
+
+            # merge with data on infections and data on population size
+            dfs_eval = pd.merge(
+                dfs_eval,
+                dfs,
+                how="left",
+                on = "date",
+                )
+            dfs_eval = pd.merge(
+                dfs_eval,
+                population_data,
+                how = "left",
+                left_on = "Bundesland",
+                right_on = "state_german",
+                )
+
+            # replace missing data by interpolation
+            dfs_eval[["cumulative_cases", "scale_to_100k"]] = dfs_eval[["cumulative_cases", "scale_to_100k"]].interpolate()
+
+            # compute empirical cases per 100k inhabitants
+            dfs_eval["cumulative_cases/100k"] = dfs_eval["cumulative_cases"] * dfs_eval["scale_to_100k"]
+
+            # find the day with approx. 50 infections per 100k inhabitants and set it as start date of the simulation
+            dfs_eval["case_diff_to_start_date"] = abs(dfs_eval["cumulative_cases/100k"] - 50) # initial empirical infections
+            start_date = (dfs_eval
+                          [dfs_eval["case_diff_to_start_date"] == dfs_eval["case_diff_to_start_date"].min()]
+                          ["Meldedatum"]
+                          .reset_index(drop=True)
+                          [0]
+                          )
+
+            # set end date of the simulation
+            end_date = start_date + dt.timedelta(days = n_simulated_days - 1)
+
+            # keep only data within the relevant dates
+            dfs_eval = dfs_eval[dfs_eval["date"] >= start_date.date()]
+            dfs_eval = dfs_eval[dfs_eval["date"] <= end_date.date()]
+            dfs_eval = dfs_eval.reset_index()
+
+            # create a list of infection data (for calibration)
+            eval_data = list(dfs_eval["cumulative_cases/100k"])
+
+            # create a dataframe of evaluation data with selected columns
+            df_eval = dfs_eval[["date", "cumulative_cases", "cumulative_cases/100k"]]
+            df_eval.columns = ["date", "empirical_cumulative_cases", "empirical_cumulative_cases/100k"]
+
+            return eval_data, df_eval, start_date, end_date
+
+        return self.get(
+            "eval_data_" + str(state) + "_" + str(n_simulated_days),
+            [self.rki_file, Path.joinpath(self.germany, "population_data.xlsx")],
+            prepare,
+            )
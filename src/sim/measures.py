@@ -0,0 +1,163 @@
+import datetime as dt
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+
+
+class Clock:
+    """
+    Precomputed simulation clock.
+    For each tick, the clock time (hour), the day of the simulation, the weekday and
+    the phase of the timetable of measures are computed once before the simulation loop,
+    so that the loop does not need any datetime arithmetic.
+    """
+
+    def __init__(
+            self,
+            start_datetime: dt.datetime,
+            end_datetime: dt.datetime,
+            n_hours_per_day: int,
+            n_ticks_per_hour: int,
+            n_hours_timetravel: int,
+            timetable: dict,
+            ):
+
+        # number of ticks to simulate
+        days = (end_datetime - start_datetime).days
+        self.n_ticks: int = days * n_hours_per_day * n_ticks_per_hour
+
+        # datetimes at which the phases of the timetable start
+        phase_starts = list(timetable)
+        assert phase_starts == sorted(phase_starts), "the timetable has to be ordered by date"
+        assert phase_starts[0] <= start_datetime, "the timetable has to start before the simulation"
+
+        # clock time of each tick
+        self.hour: List[int] = []
+
+        # day of the simulation of each tick
+        self.day: List[int] = []
+
+        # weekday of each tick (0 = monday)
+        self.weekday: List[int] = []
+
+        # index of the phase of the timetable, which is valid in each tick
+        self.phase: List[int] = []
+
+        # whether a new day begins in this tick
+        self.new_day: List[bool] = []
+
+        # datetime of each tick
+        self.datetime: List[dt.datetime] = []
+
+        current_datetime = start_datetime
+        simulation_day = 0
+        weekday = current_datetime.weekday()
+        phase = self.get_phase(phase_starts, current_datetime)
+
+        for tick in range(self.n_ticks):
+
+            # one hour step
+            current_datetime_temp = current_datetime
+            current_datetime = current_datetime + dt.timedelta(hours = 1)
+
+            # when it is 1 a.m., jump forward in time
+            if current_datetime.hour == 1:
+                current_datetime = current_datetime + dt.timedelta(hours = n_hours_timetravel)
+
+            # when a new day begins, the weekday and the plan of measures change
+            new_day = current_datetime_temp.day != current_datetime.day
+            if new_day:
+                simulation_day += 1
+                weekday = current_datetime.weekday()
+                phase = self.get_phase(phase_starts, current_datetime)
+
+            self.hour.append(current_datetime.hour)
+            self.day.append(simulation_day)
+            self.weekday.append(weekday)
+            self.phase.append(phase)
+            self.new_day.append(new_day)
+            self.datetime.append(current_datetime)
+
+
+    @staticmethod
+    def get_phase(phase_starts: List[dt.datetime], current_datetime: dt.datetime) -> int:
+        """Returns the index of the last phase which started before or at the given datetime."""
+        return int(np.searchsorted(phase_starts, current_datetime, side="right")) - 1
+
+
+class CompiledTimetable:
+    """
+    Timetable of measures compiled into dense arrays.
+    The probabilities of working from home, of a lockdown of the workplace and of
+    short time work are looked up once per phase of the timetable and stored in arrays
+    indexed by [phase, nace2] or [phase, nace2_short], so that the decisions of all
+    workers can be drawn in one vectorized step.
+    Unknown NACE2 codes are stored as NaN.
+    """
+
+    def __init__(
+            self,
+            timetable: dict,
+            wfh_data: pd.DataFrame,
+            nace2_lockdown_data: pd.DataFrame,
+            nace2_short_reduction_of_workhours: pd.DataFrame,
+            ):
+
+        # the plans of measures in the order of the timetable
+        self.phases: List[dict] = list(timetable.values())
+
+        # the measures which are a single number for all agents
+        self.school = np.array([measures["school"] for measures in self.phases], dtype=float)
+        self.kindergartens = np.array([measures["kindergartens"] for measures in self.phases], dtype=float)
+        self.university = np.array([measures["university"] for measures in self.phases], dtype=float)
+        self.supermarkets = np.array([measures["supermarkets"] for measures in self.phases], dtype=float)
+        self.household_quarantine = np.array([measures["quarantine"] == "household" for measures in self.phases])
+
+        # the measures which depend on the NACE2 code or section of the agent
+        self.p_wfh = self.compile_column(wfh_data, "wfh")
+        self.p_lockdown = self.compile_column(nace2_lockdown_data, "nace2_lockdown")
+        self.p_short_work = self.compile_column(nace2_short_reduction_of_workhours, "nace2_reduction_of_workhours")
+
+
+    def compile_column(self, data: pd.DataFrame, measure: str) -> np.ndarray:
+        """
+        Returns an array of shape (n_phases, max_code + 1) containing for each phase
+        the column of the data, which is named in the plan of measures, indexed by code.
+        """
+        codes = data.index.to_numpy(dtype=int)
+        assert (codes >= 0).all()
+
+        table = np.full((len(self.phases), codes.max() + 1), np.nan)
+        for phase, measures in enumerate(self.phases):
+            values = data[measures[measure]].to_numpy(dtype=float)
+            assert ((0 <= values) & (values <= 1)).all()
+            table[phase, codes] = values
+
+        return table
+
+
+    def check_codes(self, nace2: np.ndarray, nace2_short: np.ndarray):
+        """Checks (once) that there is data on all NACE2 codes and sections of the workers."""
+        assert not np.isnan(self.p_wfh[:, nace2]).any()
+        assert not np.isnan(self.p_lockdown[:, nace2_short]).any()
+        assert not np.isnan(self.p_short_work[:, nace2_short]).any()
+
+
+    def draw_work_at_home(
+            self,
+            phase: int,
+            nace2: np.ndarray,
+            nace2_short: np.ndarray,
+            random: Callable[[], np.ndarray],
+            ) -> np.ndarray:
+        """
+        Draws for each worker whether the worker works at home today,
+        because of homeoffice, closure of the workplace or short time work.
+        random() returns one uniform random number per worker.
+        """
+        return (
+            (random() < self.p_wfh[phase, nace2]) |
+            (random() < self.p_lockdown[phase, nace2_short]) |
+            (random() < self.p_short_work[phase, nace2_short])
+            )
@@ -0,0 +1,110 @@
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class Household:
+    """
+    One household of agents.
+    The household and the static attributes of the SOEP-household are shared by all
+    members instead of being copied onto each agent (see Agent.household).
+    """
+
+    __slots__ = ("members", "hid", "federal_state")
+
+    def __init__(self, members: list, hid: int, federal_state: int):
+
+        # agents living in this household
+        self.members: list = members
+
+        # SOEP household id
+        self.hid: int = hid
+
+        # federal state
+        self.federal_state: int = federal_state
+
+
+    def __iter__(self):
+        return iter(self.members)
+
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+
+class SoepHouseholds:
+    """
+    The SOEP-households of a federal state, pre-grouped for sampling.
+    The persons of each household are stored in consecutive rows of one array per
+    attribute (household h consists of the rows first_row[h] to first_row[h] + size[h] - 1).
+    Households are drawn proportionally to their (truncated) survey weights by a binary
+    search on the cumulative weights, so that any number of households can be drawn
+    in one vectorized step.
+    """
+
+    # attributes of the persons (columns of the SOEP-data)
+    columns = (
+        "hid",
+        "pid",
+        "federal_state",
+        "age",
+        "gender",
+        "nace2",
+        "nace2_short",
+        "computed_work_hours_day",
+        "hours_shopping_mi",
+        "student",
+        )
+
+    def __init__(self, soep: pd.DataFrame):
+
+        # persons ordered by household (keeping the order of the persons within a household)
+        soep = soep.sort_values("hid", kind="stable")
+        hids = soep["hid"].to_numpy()
+
+        # first row and number of persons of each household
+        new_household = np.concatenate(([True], hids[1:] != hids[:-1]))
+        self.first_row: np.ndarray = np.flatnonzero(new_household)
+        self.size: np.ndarray = np.diff(np.append(self.first_row, len(hids)))
+
+        # attributes of the persons
+        self.data: Dict[str, np.ndarray] = {column: soep[column].to_numpy() for column in self.columns}
+
+        # cumulative household weights (the weight of the first person of each household)
+        weights = soep["bhhhrf"].to_numpy()[self.first_row].astype(int)
+        assert (weights >= 0).all() and weights.sum() > 0
+        self.cumulative_weights: np.ndarray = np.cumsum(weights)
+
+        # expected household size (for choosing the number of households to draw at once)
+        self.mean_size: float = float((weights * self.size).sum() / weights.sum())
+
+
+    def draw_households(self, n: int, generator: np.random.Generator) -> np.ndarray:
+        """Draws n households (indices) proportionally to their weights."""
+
+        total_weight = self.cumulative_weights[-1]
+        return np.searchsorted(self.cumulative_weights, generator.integers(0, total_weight, n), side="right")
+
+
+    def sample(self, N: int, generator: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Draws households until the population has at least N persons.
+        Returns the rows of all persons of the drawn households (household by household)
+        and the number of persons of each drawn household.
+        """
+
+        households = np.empty(0, dtype=np.int64)
+        n = 0
+        while n < N:
+            # draw (more than) enough households at once and keep those needed to reach N
+            new_households = self.draw_households(int((N - n) / self.mean_size * 1.1) + 1, generator)
+            cumulative_size = n + np.cumsum(self.size[new_households])
+            n_needed = int(np.searchsorted(cumulative_size, N)) + 1
+            households = np.append(households, new_households[:n_needed])
+            n = int(cumulative_size[min(n_needed, len(new_households)) - 1])
+
+        sizes = self.size[households]
+        rows = np.repeat(self.first_row[households] - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+
+        return rows, sizes
@@ -0,0 +1,82 @@
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class RandomNumbers:
+    """
+    Random number service of one simulation run (replicate).
+    All random numbers are drawn from one seedable numpy.random.Generator.
+    Uniform random numbers are drawn in large blocks and handed out
+    one by one through a cheap cursor (the __next__ method of a generator),
+    so that the per-call overhead of numpy is paid only once per block.
+    Vectorized code can use the Generator directly (attribute "generator").
+    """
+
+    def __init__(self, seed=None, block_size: int = 65536):
+
+        # seed may be an int, a np.random.SeedSequence or None (random seed)
+        self.generator: np.random.Generator = np.random.default_rng(seed)
+
+        # number of random numbers drawn at once
+        self.block_size = block_size
+
+        # cursor on the stream of uniform random numbers
+        self.random = self.stream(self.generator.random).__next__
+
+
+    def stream(self, draw_block) -> Iterator[float]:
+        """Endless stream of random numbers, drawn block by block."""
+
+        while True:
+            yield from draw_block(self.block_size).tolist()
+
+
+    def choice(self, sequence: Sequence):
+        """Returns a random element of a non-empty sequence."""
+
+        return sequence[int(self.random() * len(sequence))]
+
+
+    def randrange(self, n: int) -> int:
+        """Returns a random integer between 0 and n - 1."""
+
+        return int(self.random() * n)
+
+
+    def sample(self, population: Sequence, k: int) -> List:
+        """Returns k different random elements of the population."""
+
+        return [population[i] for i in self.generator.choice(len(population), k, replace=False)]
+
+
+    def shuffle(self, x: list):
+        """Shuffles a list in place."""
+
+        x[:] = [x[i] for i in self.generator.permutation(len(x))]
+
+
+def spawn_seeds(seed: Optional[int], n: int) -> List[np.random.SeedSequence]:
+    """
+    Returns independent seeds for n replicates of the simulation.
+    If seed is None, the seeds are random.
+    """
+    return np.random.SeedSequence(seed).spawn(n)
+
+
+def split_seed(seed) -> Tuple[Optional[np.random.SeedSequence], Optional[np.random.SeedSequence]]:
+    """
+    Returns two independent seeds derived from the seed of a run: one for building
+    the world and one for simulating it. Thus, a world can be reused (see WorldCache)
+    without changing the random numbers of the simulation.
+    If seed is None, both seeds are random.
+    """
+    if seed is None:
+        return None, None
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    world_seed, simulation_seed = [
+        np.random.SeedSequence(seed.entropy, spawn_key=seed.spawn_key + (i,))
+        for i in range(2)
+        ]
+    return world_seed, simulation_seed
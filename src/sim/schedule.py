@@ -0,0 +1,51 @@
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+class TransitionSchedule:
+    """
+    Calendar queue for the transitions between the states of infection.
+    Since the durations of the stages of infection are fixed when an agent is exposed,
+    the tick of each agent's next transition is known in advance.
+    The scheduled items (Agent-objects or arrays of agent indices) are stored in one
+    bucket per tick, so that only the agents whose transition is due have to be
+    touched in each tick.
+    The same calendar queue is used for the ends of the agents' activities.
+    """
+
+    def __init__(self):
+
+        # key = tick; value = list of items which are due in this tick
+        self.buckets: Dict[int, List[Any]] = {}
+
+
+    def add(self, item, tick: int):
+        """Schedules a single item for the given tick."""
+
+        self.buckets.setdefault(tick, []).append(item)
+
+
+    def add_array(self, items: np.ndarray, ticks: np.ndarray):
+        """Schedules an array of items, each for its own tick."""
+
+        if len(items) == 0:
+            return
+
+        order = np.argsort(ticks, kind="stable")
+        items = items[order]
+        ticks = ticks[order]
+
+        unique_ticks, first_positions = np.unique(ticks, return_index=True)
+        for tick, group in zip(unique_ticks, np.split(items, first_positions[1:])):
+            self.buckets.setdefault(int(tick), []).append(group)
+
+
+    def pop(self, tick: int) -> List[Any]:
+        """Removes and returns all items which are due in the given tick."""
+
+        return self.buckets.pop(tick, [])
+
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.buckets.values())
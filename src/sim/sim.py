@@ -1,8 +1,9 @@
+import copy
 import datetime as dt
+import multiprocessing
 from pathlib import Path
-import random
 import time
-from typing import List
+from typing import Callable, List, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
@@ -11,10 +12,20 @@ from mpire import WorkerPool
 
 import src
 from src.sim.agent import Agent
+from src.sim.array_engine import ArrayEngine
+from src.sim.assignment import InstitutionAssignment
 from src.sim.world import World
 from src.sim.cell import Cell
 from src.sim.building import Building
-from src.sim.helper import dates_between
+from src.sim.codes import *
+from src.sim.input_data import InputData
+from src.sim.measures import Clock, CompiledTimetable
+from src.sim.population import Household
+from src.sim.rng import RandomNumbers, spawn_seeds, split_seed
+from src.sim.schedule import TransitionSchedule
+from src.sim.statistics import RunCollector
+from src.sim.tau_leap_engine import TauLeapEngine
+from src.sim.world_cache import WorldCache
 
 pd.options.mode.chained_assignment = None
 
@@ -27,6 +38,13 @@ class Sim:
     After creating an instance one can run the simulation model by executing the
     run()-method. The run()-method expects a list of input-values, which determine
     certain properties of the model run (infection probability, number of runs etc.).
+    The argument "engine" selects how the agents are simulated: "agent" uses one
+    Agent-object per agent, "array" uses the vectorized ArrayEngine and "batch" uses
+    the ArrayEngine to simulate the repetitions of a run together in one batch per core.
+    "tau" uses the approximate TauLeapEngine, which advances nights and weekends in
+    larger steps (for large populations).
+    The argument "seed" makes the runs reproducible: each internal run gets its own
+    independent random stream derived from this seed (random, if seed is None).
     """
 
     def __init__(
@@ -34,13 +52,20 @@ class Sim:
             state: int,
             n_simulated_days: int = 100,
             n_cores: int = 1,
+            engine: str = "agent",
+            seed: int = None,
             ):
         
 
 
         assert state in [2,8,9,10]
+        assert engine in ["agent", "array", "batch", "tau"]
         
         self.n_cores = n_cores
+        
+        self.engine = engine
+        
+        self.seed = seed
 
         self.state = state
         
@@ -58,40 +83,27 @@ class Sim:
             10: "Saarland",
         }
         
+        # prepared input data (parsed and prepared once, see src.sim.input_data)
+        input_data = InputData()
+        
         # load school data
-        school_data = pd.read_excel(Path.joinpath(src.PATH, "data", "germany", "schools.xlsx"))
-        school_data["pupils/school"] = school_data["pupils"] // school_data["schools"]
-        school_data["pupils/class"] = school_data["pupils"] // school_data["classes"]
-        school_data["classes/school"] = school_data["classes"] // school_data["schools"]
-        school_data = school_data.set_index(school_data["state"])
-        self.school_data: pd.DataFrame = school_data
+        self.school_data: pd.DataFrame = input_data.get_school_data()
         
         # load kindergarten data        
-        kids_per_kindergarten = pd.read_excel(Path.joinpath(src.PATH, "data", "germany", "kindergarten_group_size.xlsx"))
-        kids_per_kindergarten = kids_per_kindergarten.set_index("state")
-        kids_per_kindergarten = int(kids_per_kindergarten.loc[self.fed_states[state], "kindergarten_group_size"])
+        kids_per_kindergarten = input_data.get_kids_per_kindergarten(self.fed_states[state])
         
         # load homeoffice data
-        wfh_data = pd.read_csv(Path.joinpath(src.PATH, "data", "germany", "wfh_nace2.csv"))
-        wfh_data = wfh_data.set_index("nace2")
-        wfh_data["wfh_freq"] = wfh_data["wfh_freq"] / 100
-        wfh_data["wfh_feas"] = wfh_data["wfh_feas"] / 100
-        self.wfh_data: pd.DataFrame = wfh_data
+        self.wfh_data: pd.DataFrame = input_data.get_wfh_data()
         
         # load data on closed workplaces
-        nace2_lockdown_data = pd.read_csv(Path.joinpath(src.PATH, "data", "germany", "nace2_lockdown.csv"))
-        nace2_lockdown_data = nace2_lockdown_data.set_index("nace2_short")
-        self.nace2_lockdown_data: pd.DataFrame = nace2_lockdown_data
+        self.nace2_lockdown_data: pd.DataFrame = input_data.get_nace2_lockdown_data()
         
         # load data on reduced work hours
-        nace2_short_reduction_of_workhours = pd.read_excel(Path.joinpath(src.PATH, "data", "germany", "nace2_short_reduction_of_workhours.xlsx"))
-        nace2_short_reduction_of_workhours["quarter2"] = nace2_short_reduction_of_workhours["quarter2"] / (-100)
-        nace2_short_reduction_of_workhours = nace2_short_reduction_of_workhours.set_index("nace2_short")
-        self.nace2_short_reduction_of_workhours = nace2_short_reduction_of_workhours
+        self.nace2_short_reduction_of_workhours = input_data.get_nace2_short_reduction_of_workhours()
         
-        # load soep-data 
-        soep = pd.read_csv(Path.joinpath(src.PATH, "data", "soep4sim", "soep_for_corona_simulation.csv"))
-        self.soep: pd.DataFrame = soep[soep["federal_state"] == state]
+        # load soep-data & soep-households grouped for sampling
+        self.soep: pd.DataFrame
+        self.soep, self.soep_households = input_data.get_soep(state)
         
         # average number of possible contacts / colleagues at work
         self.n_colleagues: int = 10
@@ -111,6 +123,10 @@ class Sim:
         # number of hours students visit university
         self.hours_at_university: int = 4
         
+        # Are the locations placed on a grid? (deprecated)
+        # Without a grid, the number of locations is not limited and each household gets its own home.
+        self.use_grid: bool = False
+        
         # number of cells on x-axis (deprecated)
         self.grid_x_len: int = 100
         
@@ -188,6 +204,24 @@ class Sim:
             "80+"  : 0.90,
             }
         
+        # directory of the on-disk cache of built worlds (None = worlds are always built)
+        # (see src.sim.world_cache; only used if the model has a seed)
+        self.world_cache_dir: Optional[Path] = None
+        
+        # start method of the worker processes ("fork" shares the model with the workers without copying;
+        # not available on Windows)
+        self.start_method: str = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        
+        # pool of worker processes (started by the first run and kept alive until close() is called,
+        # see get_pool) & the attributes of the model the workers were started with
+        self.pool: Optional[WorkerPool] = None
+        self.pool_model_attributes: Optional[dict] = None
+        
+        # replications of a run whose output dataframes are kept (True = all, False = none,
+        # or a list of the indices of the replications); of the others, only the daily
+        # statistics are kept (see src.sim.statistics)
+        self.keep_replicates: Union[bool, List[int]] = True
+        
         # storage for output data
         self.dict_of_output_data = {}
         self.latest_output_data = None
@@ -196,85 +230,19 @@ class Sim:
         ### data on infections & simulated dates & evaluation data for model calibration ###
         
         # load data on population size
-        population_data = pd.read_excel(Path.joinpath(src.PATH, "data", "germany", "population_data.xlsx"))
-        population_data["scale_to_100k"] = 100000 / population_data["population"]
-        self.population_data = population_data.set_index("state")
-        
-        # load data on infections & merge with data on population
-        df = pd.read_csv(Path.joinpath(src.PATH, "data", "germany", "RKI_COVID19_neu.csv"))
-        df = pd.merge(df, population_data, how = "left", left_on = "Bundesland", right_on = "state_german")
-        
-        # filter by state ("dfs" = "df_state")
-        dfs = df[df["Bundesland"] == self.fed_states_german[state]]
-        
-        # get datetime
-        dfs["Meldedatum"] = pd.to_datetime(dfs["Meldedatum"])
-        
-        
-        # get daily infections
-        dfs = (dfs
-               [["Meldedatum", "Bundesland", "AnzahlFall"]]
-               .groupby(["Meldedatum", "Bundesland"])
-               .sum()
-               .reset_index()
-               )
-        
-        # get daily cumulative cases
-        dfs["cumulative_cases"] = dfs["AnzahlFall"].cumsum()
-        
-        # get date from datetime
-        dfs["date"] = dfs["Meldedatum"].apply(lambda x: x.date())
-        
-        # create a list of dates within the relevant period of time
-        dates = dates_between(dt.date(2020,3,1), dt.date(2020,9,15))
+        self.population_data = input_data.get_population_data().set_index("state")
         
-        # create a new dataframe with the list of dates
-        dfs_eval = pd.DataFrame({"date": dates})
-        
-        # merge with data on infections and data on population size
-        dfs_eval = pd.merge(
-            dfs_eval, 
-            dfs, 
-            how="left", 
-            on = "date",
-            )
-        dfs_eval = pd.merge(
-            dfs_eval, 
-            population_data, 
-            how = "left", 
-            left_on = "Bundesland", 
-            right_on = "state_german",
+        # load data on infections & compute the evaluation data (see InputData.get_eval_data)
+        eval_data, df_eval, start_date, end_date = input_data.get_eval_data(
+            state, 
+            self.fed_states_german[state], 
+            n_simulated_days,
             )
         
-        # replace missing data by interpolation
-        dfs_eval[["cumulative_cases", "scale_to_100k"]] = dfs_eval[["cumulative_cases", "scale_to_100k"]].interpolate()
-        
-        # compute empirical cases per 100k inhabitants
-        dfs_eval["cumulative_cases/100k"] = dfs_eval["cumulative_cases"] * dfs_eval["scale_to_100k"]
-        
-        # find the day with approx. 50 infections per 100k inhabitants and set it as start date of the simulation
-        dfs_eval["case_diff_to_start_date"] = abs(dfs_eval["cumulative_cases/100k"] - 50) # initial empirical infections
-        start_date = (dfs_eval
-                      [dfs_eval["case_diff_to_start_date"] == dfs_eval["case_diff_to_start_date"].min()]
-                      ["Meldedatum"]
-                      .reset_index(drop=True)
-                      [0]
-                      )
-        
-        # set end date of the simulation
-        end_date = start_date + dt.timedelta(days = n_simulated_days - 1)
-        
-        # keep only data within the relevant dates
-        dfs_eval = dfs_eval[dfs_eval["date"] >= start_date.date()]
-        dfs_eval = dfs_eval[dfs_eval["date"] <= end_date.date()]
-        dfs_eval = dfs_eval.reset_index()
-        
         # create a list of infection data (for calibration)
-        self.eval_data = list(dfs_eval["cumulative_cases/100k"])
+        self.eval_data = eval_data
         
         # create a dataframe of evaluation data with selected columns
-        df_eval = dfs_eval[["date", "cumulative_cases", "cumulative_cases/100k"]]
-        df_eval.columns = ["date", "empirical_cumulative_cases", "empirical_cumulative_cases/100k"]
         self.df_eval = df_eval
         
         # Date of the first day in the simulation
@@ -289,13 +257,14 @@ class Sim:
             building_type, 
             n,
             world,
+            rng,
             ):
         for i in range(n):
-            building = Building(building_type)
-            building.build_it_on_random_position(
-                world.grid_as_flat_list,
-                world.grid_as_matrix,
-                )
+            if world.has_grid:
+                building = Building(building_type)
+                building.build_it_on_random_position(world, rng)
+            else:
+                world.add_location(building_type)
         
 
     def run(self, params):
@@ -320,15 +289,44 @@ class Sim:
             ]
         
         OUTPUT
-        output_dict: dictionary which contains 3 datasets
-            df: main output dataframe
+        output_dict: dictionary which contains 4 datasets
+            df: main output dataframe (the replications kept according to keep_replicates;
+                if none is kept, the daily statistics)
             calibration_data: list containg only the cumulative number of infections per day
+            statistics: dataframe of the mean, standard deviation and quantiles of the cumulative
+                number of infections per day (over all replications)
             age_distributions: list of lists containing the age of all infected agents per internal run
         
+        The replications are collected in the order in which they are done. Their daily
+        numbers are added to running statistics at once, so that only the replications
+        to keep are stored until the end of the run.
+        
         """
         
         start_time = time.time()
         
+        # tasks of all replications of the simulation
+        task_function, tasks, collector = self.prepare_run(params)
+        
+        # warm pool of worker processes sharing the model (inherited by fork, not sent with each task)
+        pool = self.get_pool()
+        
+        # run all tasks & add their outputs to the running statistics as they arrive
+        for task, outputs in pool.imap_unordered(task_function, tasks, chunk_size=1):
+            collector.add(task, outputs)
+        
+        return self.collect_run(collector, start_time)
+    
+    
+    def prepare_run(self, params) -> Tuple[Callable, List[dict], RunCollector]:
+        
+        """
+        Prepares a run of the simulation model (see run() for the list of parameter values).
+        Returns the function processing the tasks in the worker processes, the arguments
+        of each task (one task per replication or, if engine is "batch", one task per batch
+        of replications) and the collector of the outputs of the tasks.
+        """
+        
         # unpack list of parameters
         infection_prob, n_initial_infections, n, n_random_infections, timetable, n_ticks_to_quarantine, n_internal_runs, name_of_run, save_output, display_simulation = params
         
@@ -339,70 +337,91 @@ class Sim:
         assert type(save_output) == bool
         assert type(display_simulation) == bool
         
-        # create name of output file
-        output_file_name = "output " + str(dt.datetime.now()).replace(":","-").replace(".","-") + ".csv"
-        
-        # Infection probabilities for each location type.
+        # Infection probabilities for each location type (see src.sim.codes).
         # At the moment, the same probability applies to all locations.
         location_dependend_infection_prob_dict = {
-            "home": infection_prob / self.n_ticks_per_hour,
-            "street":infection_prob / self.n_ticks_per_hour,
-            "supermarket": infection_prob / self.n_ticks_per_hour,
-            "school": infection_prob / self.n_ticks_per_hour,
-            "university": infection_prob / self.n_ticks_per_hour,
-            "kindergarten": infection_prob / self.n_ticks_per_hour,
-            "firm": infection_prob / self.n_ticks_per_hour,
+            HOME: infection_prob / self.n_ticks_per_hour,
+            STREET: infection_prob / self.n_ticks_per_hour,
+            SUPERMARKET: infection_prob / self.n_ticks_per_hour,
+            SCHOOL: infection_prob / self.n_ticks_per_hour,
+            UNIVERSITY: infection_prob / self.n_ticks_per_hour,
+            KINDERGARTEN: infection_prob / self.n_ticks_per_hour,
+            FIRM: infection_prob / self.n_ticks_per_hour,
             }
-        for i in range(1, 22):
-            location_dependend_infection_prob_dict.update(
-                {"firm"+str(i):location_dependend_infection_prob_dict["firm"]}
-                )
         
         # Desired number of agents
         self.N = int(n)
         
-        # Population size of federal state
-        empirical_population_size = self.population_data.loc[self.fed_states[self.state],"population"]
+        # independent seeds of the random streams of all replications
+        seeds = spawn_seeds(self.seed, n_internal_runs)
+        
+        # arguments of each task (sent to the worker processes)
+        run_arguments = {
+            "n_agents": self.N,
+            "location_dependend_infection_prob_dict": location_dependend_infection_prob_dict,
+            "simulation_run": 999,
+            "n_initial_infections": int(n_initial_infections),
+            "n_random_infections": n_random_infections,
+            "timetable": timetable,
+            "n_ticks_to_quarantine": n_ticks_to_quarantine,
+            }
+        
+        # all replications of the simulation in batches (one batch per core)
+        if self.engine == "batch":
+            batches = [batch.tolist() for batch in np.array_split(np.arange(n_internal_runs), self.n_cores) if len(batch) > 0]
+            tasks = [dict(run_arguments, task=task, seeds=[seeds[x] for x in batch]) for task, batch in enumerate(batches)]
+            task_function = internal_batch_run_task
+        
+        # all replications of the simulation (one task per replication)
+        else:
+            batches = [[x] for x in range(n_internal_runs)]
+            tasks = [dict(run_arguments, task=x, display_simulation=display_simulation, seed=seeds[x]) for x in range(n_internal_runs)]
+            task_function = internal_run_task
+        
+        # collector of the outputs (running statistics & the replications to keep)
+        collector = RunCollector(
+            name_of_run = name_of_run,
+            save_output = save_output,
+            replicates_of_task = batches,
+            n_days = len(self.eval_data),
+            keep_replicates = self.keep_replicates,
+            )
+        
+        return task_function, tasks, collector
+    
+    
+    def collect_run(self, collector: RunCollector, start_time: float) -> dict:
+        
+        """
+        Creates the output of a run (see run()) from the collected outputs of its tasks
+        (see prepare_run) and saves it on disk (if save_output is True) and as attribute of the model.
+        """
+        
+        name_of_run = collector.name_of_run
+        save_output = collector.save_output
         
         # Lists for storing outputdata of multiple repetitions of simulation
-        list_of_scaled_cum_infections = []
-        output_dataframes = []
         age_distributions = []
         
-        # run all replications of the simulation
-        with WorkerPool(n_jobs=self.n_cores, use_dill=True) as pool:
-            output_dicts = pool.map(
-                lambda x: self.internal_run(
-                    n_agents = self.N,
-                    location_dependend_infection_prob_dict = location_dependend_infection_prob_dict,
-                    simulation_run = 999,
-                    n_initial_infections = int(n_initial_infections),
-                    n_random_infections = n_random_infections,
-                    timetable = timetable,
-                    n_ticks_to_quarantine = n_ticks_to_quarantine,
-                    display_simulation=display_simulation,
-                    ),
-                    range(n_internal_runs)
-                )
-  
-        # calculate average results for calibration purposes
-        avg_scaled_cumulative_cases = [sum(t)/len(t) for t in zip(*list_of_scaled_cum_infections)]
-
-        # append df to list
-        output_dataframes = [output_dict["cases"] for output_dict in output_dicts]
-            
-        # append data on adj. cases / 100k as a list to a list (for calibration)
-        list_of_scaled_cum_infections = [list(df["adj_cumulative_cases/100k"]) for df in output_dataframes]
-            
-        # calculate average results for calibration purposes
-        avg_scaled_cumulative_cases = [sum(t)/len(t) for t in zip(*list_of_scaled_cum_infections)]
-
+        # daily statistics of all replications
+        statistics = collector.get_statistics()
+        statistics["datetime"] = [self.start_datetime + dt.timedelta(days = day) for day in range(len(statistics))]
+        statistics["date"] = statistics["datetime"].apply(lambda x: x.date())
+        statistics = statistics.merge(self.df_eval, on="date")
+        statistics["name_of_run"] = name_of_run
+        
+        # average results for calibration purposes
+        avg_scaled_cumulative_cases = list(statistics["adj_cumulative_cases/100k"])
 
-        # create main dataframe
-        output_dataframe = pd.concat(output_dataframes)
-        output_dataframe["date"] = output_dataframe["datetime"].apply(lambda x: x.date())
-        output_dataframe = output_dataframe.merge(self.df_eval, on="date")
-        output_dataframe["name_of_run"] = name_of_run
+        # create main dataframe (the kept replications or, if no replication was kept, the daily statistics)
+        output_dataframes = collector.get_replicates()
+        if output_dataframes:
+            output_dataframe = pd.concat(output_dataframes)
+            output_dataframe["date"] = output_dataframe["datetime"].apply(lambda x: x.date())
+            output_dataframe = output_dataframe.merge(self.df_eval, on="date")
+            output_dataframe["name_of_run"] = name_of_run
+        else:
+            output_dataframe = statistics.copy()
         
         # measure computation time
         end_time = time.time()
@@ -424,6 +443,7 @@ class Sim:
         output_dict = {
             "df": output_dataframe, # main output dataframe
             "calibration_data": avg_scaled_cumulative_cases, # data for calibration
+            "statistics": statistics, # mean, sd & quantiles per day
             "age_distributions": age_distributions,
             }
 
@@ -436,364 +456,167 @@ class Sim:
         return output_dict
     
     
-    def internal_run(
-            self,
-            n_agents,
-            location_dependend_infection_prob_dict: dict,
-            simulation_run: int,
-            n_ticks_to_quarantine,
-            n_initial_infections,
-            n_random_infections,
-            timetable,
-            display_simulation,
-        ):
-        
+    def get_shared_model(self) -> "Sim":
         """
-        This method runs the simulation internally. 
-        For each model repetition, this method is executed one time by the method "run()".
+        Returns a shallow copy of the model without the stored output data of earlier runs.
+        It shares all (read-only) input data with the model and is passed to the worker
+        processes once as shared object: With the start method "fork", the workers inherit
+        it from the main process without copying, so that only the small arguments of each
+        task are sent to the workers.
         """
-
-        # create population
-        agent_population_in_households = self.create_soep_population(
-            N = self.N,
-            agent_class = Agent,
-        )
-        
-        # Count agents
-        population_size = sum([1 for household in agent_population_in_households for agent in household])
-        
-        # Calculate scaling factor to empirical population size of federal state
-        #scale_to_population = empirical_population_size / population_size
-        
-        # Count pupils
-        n_pupils = sum([1 for household in agent_population_in_households for agent in household
-                        if agent.age in self.school_age])
-        
-        # Count kindergarten kids
-        n_kindergarten_kids = sum([1 for household in agent_population_in_households for agent in household
-                        if agent.age in self.kindergarten_age])
-        
-        # Count university students
-        n_students = sum([1 for household in agent_population_in_households for agent in household
-                        if agent.student])
-        
-        # Calculate number of schools needed
-        n_schools = max(n_pupils // self.pupils_per_school, 1)
-        
-        # Calculate number of supermarkets / stores needed
-        n_supermarkets = max(population_size // self.agents_per_supermarket, 1)
-        
-        # Calculate number of Kindergarten(groups) needed
-        n_kindergartens = max(n_kindergarten_kids // self.kids_per_kindergarten, 1)
         
-        # Calculate number of universities needed
-        n_universities = max(n_students // self.students_per_university, 1)
+        shared_model = copy.copy(self)
+        shared_model.dict_of_output_data = {}
+        shared_model.latest_output_data = None
+        shared_model.pool = None
+        shared_model.pool_model_attributes = None
         
-        # Count number of Nace2-sectors in agent population and save it in df
-        n_nace2 = [agent.nace2_short for household in agent_population_in_households for agent in household]
-        n_nace2 = pd.DataFrame(
-            pd.Series(n_nace2).value_counts(), 
-            columns = ["freq_in_simpop"]
-            )
+        return shared_model
     
-        # create world
-        world = World(self.grid_x_len, self.grid_y_len)
-        world.create_grid(Cell)
-    
-        # create agent population
-        world.agents.update({"agents": []})
     
-        families = agent_population_in_households
-        
-
-        #######################################################################
-        # build locations
-        #######################################################################
-        
+    def get_model_attributes(self) -> dict:
         """
-        In this and the following sections, the locations of the simulated world are created. 
-        Each location is a cell on a grid, which itself can have several "rooms". 
-        An agent is assigned to a location and a room within the location. 
-        This design was once implemented to model realistic traffic flows, 
-        e.g. to have many agents travel to the same school but split into different classrooms. 
-        However, this version of the simulation does not model movement between places anyway, 
-        so this implementation does not really make sense. 
-        It is retained, however, in order to reintroduce movement flows if necessary.
-        
+        Returns the attributes of the model the worker processes depend on
+        (all attributes except the pool and the output data). Containers are copied,
+        so that later changes of their content are detected by pool_is_up_to_date().
         """
         
-        # build supermarkets
-        self.build_n_buildings_of_a_certain_type_random_on_screen("supermarket", n_supermarkets, world)
-        
-        # build schools
-        self.build_n_buildings_of_a_certain_type_random_on_screen("school", n_schools, world)
+        return {
+            name: copy.deepcopy(value) if isinstance(value, (dict, list, tuple, set)) else value
+            for name, value in vars(self).items()
+            if name not in ("pool", "pool_model_attributes", "dict_of_output_data", "latest_output_data", "keep_replicates")
+            }
     
-        # build kindergartens (at the moment these are in fact kindergarten groups)
-        self.build_n_buildings_of_a_certain_type_random_on_screen("kindergarten", n_kindergartens, world)
-        
-        # build universities
-        self.build_n_buildings_of_a_certain_type_random_on_screen("university", n_universities, world)
-        
-        # build one firm for each nace2-sector 
-        for nace2 in n_nace2.index:
-            if nace2 != "-1":
-                # Firmen bauen
-                self.build_n_buildings_of_a_certain_type_random_on_screen("firm" + str(nace2), 1, world)
-        
-        # find all cells without buildings
-        vacant_ground = [cell
-                         for cell in world.grid_as_flat_list
-                         if cell.cell_type == "street"]
-        
-        # build houses/homes
-        self.build_n_buildings_of_a_certain_type_random_on_screen(
-                "home", 
-                len(vacant_ground),
-                world,
-        )
     
-        #######################################################################
-        # assign agents to homes
-        #######################################################################
+    def pool_is_up_to_date(self) -> bool:
+        """Checks whether the attributes of the model are unchanged since the pool was started."""
+        
+        def is_same(a, b) -> bool:
+            if a is b:
+                return True
+            try:
+                return bool(a == b)
+            except (TypeError, ValueError):
+                # e.g. replaced dataframes or arrays
+                return False
+        
+        attributes = self.get_model_attributes()
+        return (
+            attributes.keys() == self.pool_model_attributes.keys()
+            and all(is_same(value, self.pool_model_attributes[name]) for name, value in attributes.items())
+            )
+    
+    
+    def get_pool(self) -> WorkerPool:
+        """
+        Returns the pool of worker processes. The pool is started by the first run and
+        reused by all later runs, so that the workers (with the model and the input data
+        already loaded) are started only once per calibration or experiment.
+        If an attribute of the model (e.g. the number of agents) has been changed since the
+        pool was started, the pool is restarted with the changed model.
+        The pool is kept alive until close() is called (or the model is used in a with-block).
+        """
         
-        # get all homes
-        list_of_houses = [cell 
-                          for cell in world.grid_as_flat_list
-                          if cell.cell_type == "home"]
+        if self.pool is not None and not self.pool_is_up_to_date():
+            self.close()
         
-        # for each household
-        for family in families:
-            
-            # get empty homes
-            list_of_vacant_houses = [cell 
-                                     for cell in world.grid_as_flat_list
-                                     if cell.cell_type == "home"
-                                     and cell.n_groups == 0]
-            
-            # if there are any empty homes
-            if len(list_of_vacant_houses) > 0:
-                
-                # randomly assign household to an empty home
-                house = random.choice(list_of_vacant_houses)
-            
-            else:
-                
-                # randomly assign household to a flat within a multi-family house
-                house = random.choice(list_of_houses)
-            
-            # get flat id
-            flat = house.n_groups
-                
-            # increase number of flats in the house
-            house.n_groups += 1
-                
-            # for each household, move in flat/house
-            for agent in family:
-                agent.move_in(house)
-                agent.home_cell = house
-                agent.group_dict.update({"home":flat})
-                
-                # add household/family members to agent's list of household members
-                for family_member in family:
-                    if family_member != agent:
-                        agent.household_members.append(family_member)
-                
-                # add each agent to the world's population list
-                world.agents["agents"].append(agent)
-                
-        #######################################################################
-        # assign supermarkets to agents
-        #######################################################################
+        if self.pool is None:
+            self.pool_model_attributes = self.get_model_attributes()
+            self.pool = WorkerPool(
+                n_jobs=self.n_cores,
+                shared_objects=self.get_shared_model(),
+                start_method=self.start_method,
+                keep_alive=True,
+                )
         
-        # get all supermarkets
-        list_of_supermarkets = [cell 
-                                for cell in world.grid_as_flat_list
-                                if cell.cell_type == "supermarket"]
-        
-        # randomly assign supermarkets
-        for agent in world.agents["agents"]:
-            agent.group_dict.update({"supermarket": 0})
-            agent.fav_supermarkets = []
-            for i in range(self.n_fav_supermarkets):
-                agent.fav_supermarkets.append(random.choice(list_of_supermarkets))
-            
-            
-        #######################################################################
-        # assign schools/classes to agents
-        #######################################################################
-
-        # get all schools
-        list_of_schools = [cell 
-                           for cell in world.grid_as_flat_list
-                           if cell.cell_type == "school"]
-        
-        # for each pupil
-        for agent in world.agents["agents"]:
-            if agent.age in self.school_age:
-                
-                # select random school
-                school = random.choice(list_of_schools)
-                agent.school = school
-                
-                # increase number of pupils in this school
-                school.n_users += 1
-    
-    
-        # for each school
-        for school in list_of_schools:
-            
-            # calculate number of necessary classes
-            school.n_groups = max(school.n_users // self.pupils_per_class, 1)
+        return self.pool
     
     
-        # for each agent
-        for agent in world.agents["agents"]:
-            
-            # if assigned to school 
-            if agent.school:
-                
-                # randomly assign to a class
-                agent.group_dict.update({"school": random.choice(range(agent.school.n_groups))})
-        
-        # This process could be optimized.
+    def close(self):
+        """Stops the worker processes of the pool."""
         
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+            self.pool_model_attributes = None
     
-        #######################################################################
-        # assign kindergartens
-        #######################################################################
-        
-        """
-        One kindergarten building contains only one group/room.
-        Thus, a kindergarten is in fact only a kindergarten group.
-        This does not matter for the simulation results.
-        It would be relevant and should be changed, if the traffic flows
-        were modelled.
-        """
-        
-        # select all built kindergartens
-        list_of_kindergartens = [cell 
-                                 for cell in world.grid_as_flat_list
-                                 if cell.cell_type == "kindergarten"]
     
-        # for each agent
-        for agent in world.agents["agents"]:
+    def __enter__(self) -> "Sim":
+        return self
     
-            # if agent's age is of kindergarten age
-            if agent.age in self.kindergarten_age:
-                
-                # select random kindergarten
-                kindergarten = random.choice(list_of_kindergartens)
     
-                # save kindergarten as an agent property
-                agent.kindergarten = kindergarten
+    def __exit__(self, *exc_info):
+        self.close()
     
-                # assign kindergarten group
-                agent.group_dict.update({"kindergarten": 0})
     
-        #######################################################################
-        # assign work places
-        #######################################################################
+    def internal_run(
+            self,
+            n_agents,
+            location_dependend_infection_prob_dict: dict,
+            simulation_run: int,
+            n_ticks_to_quarantine,
+            n_initial_infections,
+            n_random_infections,
+            timetable,
+            display_simulation,
+            seed = None,
+        ):
         
-        # get all workplaces
-        all_firms = [
-            cell 
-            for cell in world.grid_as_flat_list
-            if "firm" in cell.cell_type
-            ]
+        """
+        This method runs the simulation internally. 
+        For each model repetition, this method is executed one time by the method "run()".
+        """
+
+        # the vectorized engines simulate a batch containing only this run
+        if self.engine in ["array", "tau"]:
+            return self.internal_batch_run(
+                n_agents = n_agents,
+                location_dependend_infection_prob_dict = location_dependend_infection_prob_dict,
+                simulation_run = simulation_run,
+                n_ticks_to_quarantine = n_ticks_to_quarantine,
+                n_initial_infections = n_initial_infections,
+                n_random_infections = n_random_infections,
+                timetable = timetable,
+                seeds = [seed],
+                )[0]
         
-        # for each working agents
-        for agent in world.agents["agents"]:
-            if agent.work_hours_day_in_ticks > 0:
-            
-                # get all possible workplaces within the agent's nace2-sector
-                possible_work_places = [
-                    cell 
-                    for cell in all_firms
-                    if cell.cell_type == "firm" + str(agent.nace2_short)
-                    ]
-                
-                # choose a workplace
-                work_place = random.choice(possible_work_places)
-                agent.work_place = work_place
-                
-                # increase number of workers assigned to this workplace
-                work_place.n_users += 1
-            
-                
-        # for each workplace
-        for firm in all_firms:
-            # calculate number of divisions within work place
-            firm.n_groups = max(firm.n_users // self.n_colleagues, 1)
-    
-        # for each agent with a work place
-        for agent in world.agents["agents"]:
-            if agent.work_place:
-               
-                # randomly assign division with work place
-                agent.group_dict.update(
-                    {agent.work_place.cell_type: random.choice(range(agent.work_place.n_groups))}
-                    )
-                           
-        #######################################################################
-        # assign universities
-        #######################################################################
+        # separate random streams for building the world and for simulating it
+        world_seed, simulation_seed = split_seed(seed)
         
-        # get all universities
-        list_of_universities = [
-            cell 
-            for cell in world.grid_as_flat_list
-            if cell.cell_type == "university"
-            ]
+        # random number service of this run
+        rng = RandomNumbers(simulation_seed)
+        
+        # build (or load) the world and its agent population
+        world = self.get_world(world_seed)
         
-        # for each agents
-        for agent in world.agents["agents"]:
-            # if agent is student
-            if agent.student == 1:
-                # randomly assign a university
-                agent.university = random.choice(list_of_universities)
-                agent.group_dict.update({"university": 0})
         
         #######################################################################
-        # infection characteristics
+        # measures & time
         #######################################################################
         
-        def get_value_from_lognormal_dist(par1, par2):
-                # transform mean and sd
-                # (taken from covasim)
-                mean  = np.log(par1**2 / np.sqrt(par2 + par1**2)) # Computes the mean of the underlying normal distribution
-                sigma = np.sqrt(np.log(par2/par1**2 + 1)) # Computes sigma for the underlying normal distribution
-                
-                value = np.random.lognormal(mean, sigma) * self.n_ticks_per_day
-                return value
-        
-        # duration of different stages of infection as parameters (m, sd) of a log-normal distribution
-        lndp = self.log_normal_duration_parameters
+        # compile the timetable of measures into lookup tables
+        measures = CompiledTimetable(
+            timetable,
+            self.wfh_data,
+            self.nace2_lockdown_data,
+            self.nace2_short_reduction_of_workhours,
+            )
         
-        for agent in world.agents["agents"]:
-            agent.duration_s = get_value_from_lognormal_dist(lndp["s"][0], lndp["s"][1]) 
-            agent.duration_i = get_value_from_lognormal_dist(lndp["i"][0], lndp["i"][1]) 
-            agent.duration_r_a = get_value_from_lognormal_dist(lndp["r_a"][0], lndp["r_a"][1])
-            agent.duration_r_m = get_value_from_lognormal_dist(lndp["r_m"][0], lndp["r_m"][1]) 
-        
-            # age-related probabilities of developing symptoms after an infection
-            if agent.age in range(0,10):
-                agent.p_sym = self.p_sym["0-9"]
-            elif agent.age in range(10, 20):
-                agent.p_sym = self.p_sym["10-19"]
-            elif agent.age in range(20, 30):
-                agent.p_sym = self.p_sym["20-29"]
-            elif agent.age in range(30, 40):
-                agent.p_sym = self.p_sym["30-39"]
-            elif agent.age in range(40, 50):
-                agent.p_sym = self.p_sym["40-49"]
-            elif agent.age in range(50, 60):
-                agent.p_sym = self.p_sym["50-59"]
-            elif agent.age in range(60, 70):
-                agent.p_sym = self.p_sym["60-69"]
-            elif agent.age in range(70, 80):
-                agent.p_sym = self.p_sym["70-79"]
-            elif agent.age >= 80:
-                agent.p_sym = self.p_sym["80+"]
+        # check that the measures are known for the NACE2 codes of all workers
+        workers = [agent for agent in world.agents["agents"] if agent.work_hours_day_in_ticks > 0]
+        workers_nace2 = np.array([agent.nace2 for agent in workers], dtype=int)
+        workers_nace2_short = np.array([agent.nace2_short for agent in workers], dtype=int)
+        measures.check_codes(workers_nace2, workers_nace2_short)
+        
+        # precompute clock time, day, weekday and phase of the timetable of each tick
+        clock = Clock(
+            self.start_datetime,
+            self.end_datetime,
+            self.n_hours_per_day,
+            self.n_ticks_per_hour,
+            self.n_hours_timetravel,
+            timetable,
+            )
         
         
         #######################################################################
@@ -811,12 +634,30 @@ class Sim:
         # container for storing generated output data
         output_data = []
         
-        infected_agents = random.sample(world.agents["agents"], n_initial_infections)
+        # calendar queue of the agents' upcoming transitions between states of infection
+        schedule = TransitionSchedule()
+        
+        # calendar queue of the ends of the agents' activities
+        activity_ends = TransitionSchedule()
+        
+        # number of agents per state of infection (updated on each transition)
+        compartment_counts = [0] * N_INFECTION_STATES
+        compartment_counts[S] = len(world.agents["agents"])
+        
+        # agents which are able to infect others (i, a, m)
+        # (a dict instead of a set, so that the order and thus the run is reproducible)
+        infectious_agents = {}
+        
+        infected_agents = rng.sample(world.agents["agents"], n_initial_infections)
         for agent in infected_agents:
-            agent.infection = "i"
+            agent.infection = I
             agent.tick_of_infectivity = 0
             agent.tick_of_exposure = 0
-            agent.cell_of_infection = random.choice(world.grid_as_flat_list)
+            agent.cell_of_infection = rng.choice(world.locations)
+            schedule.add(agent, agent.get_tick_of_next_transition())
+            compartment_counts[S] -= 1
+            compartment_counts[I] += 1
+            infectious_agents[agent] = None
             
             new_cases += 1
             cumulative_cases += 1
@@ -854,63 +695,25 @@ class Sim:
         new_cases_age = 0
         
         #######################################################################
-        # time
+        # simulation loop
         #######################################################################
         
-        tick = 0
-        
-        # clock time in simulation
-        simulation_clock_time = 0
-        
-        # days passed in simulation since start of simulation
-        simulation_day = 0
-        
-        current_datetime = self.start_datetime
-        weekday = current_datetime.weekday()
-        
-        sim_len = self.end_datetime - self.start_datetime
-        days= sim_len.days
-        hours = days * self.n_hours_per_day
-        max_ticks = hours * self.n_ticks_per_hour
-        
-        
-        # get the current plan of measures (evtl. noch Funktion drauß machen, weil später nochmal verwendet)
-        # ACHTUNG BENÖTIGT AKTUELLES PYTHON (>= 3.7), da Dicts geordnet sein müssen
-        for datetime_key in timetable:
-            if datetime_key <= current_datetime:
-                current_measures = timetable[datetime_key]
-        
-        
-        #######################################################################
-        # simulation loop
-        #######################################################################
-        
-        simulate = True
+        simulate = True
         
         # for each time step in simulation
-        for tick in range(max_ticks):
+        for tick in range(clock.n_ticks):
             
-            # one hour step
-            current_datetime_temp = current_datetime
-            current_datetime = current_datetime + dt.timedelta(hours = 1)
-            
-            # when it is 1 a.m.
-            if current_datetime.hour == 1:
-                # jump forward in time
-                current_datetime = current_datetime + dt.timedelta(hours = self.n_hours_timetravel)
-                
-            
-            # set clock time
-            simulation_clock_time = current_datetime.hour
+            # set clock time, weekday and the current plan of measures
+            simulation_clock_time = clock.hour[tick]
+            weekday = clock.weekday[tick]
+            phase = clock.phase[tick]
+            current_measures = measures.phases[phase]
             
             # when a new day begins
-            if current_datetime_temp.day != current_datetime.day:
+            if clock.new_day[tick]:
                 
                 # increase day counter
-                simulation_day += 1
-                
-                # set weekday
-                weekday = current_datetime.weekday()
+                simulation_day = clock.day[tick]
                 
                 # collect data
                 todays_infection_data =  {
@@ -918,7 +721,7 @@ class Sim:
                      "run": simulation_run,
                      "tick": tick,
                      "day": simulation_day,
-                     "datetime": current_datetime, # today
+                     "datetime": clock.datetime[tick], # today
                      "new_cases": new_cases,
                      "cumulative_cases": cumulative_cases,
                      "new_cases_age": new_cases_age,
@@ -935,11 +738,10 @@ class Sim:
                 new_cases = 0
                 new_cases_age = 0
                 
-                infection_states = [agent.infection for agent in world.agents["agents"]]
-                n_infectious = (infection_states.count("e") + 
-                                infection_states.count("i") + 
-                                infection_states.count("a") + 
-                                infection_states.count("m")
+                n_infectious = (compartment_counts[E] + 
+                                compartment_counts[I] + 
+                                compartment_counts[A] + 
+                                compartment_counts[M]
                                 )
                 
                 # if the virus is dead, stop the simulation
@@ -948,48 +750,60 @@ class Sim:
                 
                 
                 # shuffle list of agents
-                random.shuffle(world.agents["agents"])
+                rng.shuffle(world.agents["agents"])
                 
                 # empty agents' list of activities done today
                 for agent in world.agents["agents"]:
-                    agent.activities_done_today = []
-                
-                # get the current plan of measures
-                for datetime_key in timetable:
-                    if datetime_key <= current_datetime:
-                        current_measures = timetable[datetime_key]
+                    agent.activities_done_today = 0
                 
                 # random infections
                 if n_random_infections < 1:
-                    temp = (1 if random.random() < n_random_infections else 0)
+                    temp = (1 if rng.random() < n_random_infections else 0)
                 else:
                     temp = n_random_infections
                 
                 for i in range(round(temp)):
-                    random_agent = random.choice(world.agents["agents"])
-                    if random_agent.infection == "s":
-                        random_agent.infection = "e"
+                    random_agent = rng.choice(world.agents["agents"])
+                    if random_agent.infection == S:
+                        random_agent.infection = E
                         random_agent.tick_of_exposure = tick
                         random_agent.cell_of_infection = random_agent.residence_cell
+                        schedule.add(random_agent, random_agent.get_tick_of_next_transition())
+                        compartment_counts[S] -= 1
+                        compartment_counts[E] += 1
                 
-                            
+            
             #######################################################################    
-            # FOR-LOOP AGENTS        
+            # TRANSITIONS OF INFECTION STATUS
             #######################################################################
             
             if simulate:
-            
-                # for each agent
-                for agent in world.agents["agents"]:
+                
+                # for each agent whose transition is due in this tick
+                for agent in schedule.pop(tick):
                     
                     # get and temporalily save current status of infection
                     infection_status_temp = agent.infection
                     
                     # internally update agent's status of infection
-                    agent.update_status_of_infection(tick)
+                    agent.update_status_of_infection(tick, rng)
+                    
+                    # schedule the next transition
+                    tick_of_next_transition = agent.get_tick_of_next_transition()
+                    if tick_of_next_transition is not None:
+                        schedule.add(agent, tick_of_next_transition)
+                    
+                    # update counters and the set of infectious agents
+                    compartment_counts[infection_status_temp] -= 1
+                    compartment_counts[agent.infection] += 1
+                    
+                    if agent.infection == I:
+                        infectious_agents[agent] = None
+                    elif agent.infection == R:
+                        infectious_agents.pop(agent, None)
                     
                     # if the status of infection just changed from not symptomatic/asymptomatic to symptomatic/asympotmatic
-                    if infection_status_temp not in ("a", "m") and agent.infection in ("a", "m"):
+                    if infection_status_temp not in (A, M) and agent.infection in (A, M):
                         
                         # increase number of (cumulative) cases
                         new_cases += 1
@@ -1004,10 +818,48 @@ class Sim:
                             n_inf_age_30_59 += 1
                         else:
                             n_inf_age_60 += 1
-                        
+                            
+            #######################################################################    
+            # TRANSMISSION
+            #######################################################################
+            
+            if simulate and infectious_agents:
+                
+                # only infectious agents are able to infect others (in random order)
+                transmitting_agents = list(infectious_agents)
+                rng.shuffle(transmitting_agents)
+                
+                for agent in transmitting_agents:
                     
                     # infect other agents (maybe)
-                    agent.infect(tick, location_dependend_infection_prob_dict)
+                    exposed_agent = agent.infect(tick, location_dependend_infection_prob_dict, rng)
+                    if exposed_agent:
+                        schedule.add(exposed_agent, exposed_agent.get_tick_of_next_transition())
+                        compartment_counts[S] -= 1
+                        compartment_counts[E] += 1
+                        
+            #######################################################################    
+            # FOR-LOOP AGENTS        
+            #######################################################################
+            
+            if simulate:
+                
+                # at 8 o'clock on workdays, draw for all workers at once whether they work at home
+                if weekday < 5 and simulation_clock_time == 8:
+                    work_at_home = measures.draw_work_at_home(
+                        phase,
+                        workers_nace2,
+                        workers_nace2_short,
+                        lambda: rng.generator.random(len(workers_nace2)),
+                        )
+                    for agent, at_home in zip(workers, work_at_home.tolist()):
+                        agent.work_at_home = at_home
+            
+                # agents which initialize an activity in this tick
+                starting_agents = []
+                
+                # for each agent
+                for agent in world.agents["agents"]:
                     
                     # decide whether to stay at home due to symptoms/illness
                     agent.decide_to_stay_at_home(tick, self.n_ticks_per_day)
@@ -1030,27 +882,12 @@ class Sim:
                                 # if agent is a worker
                                 if agent.work_hours_day_in_ticks > 0:
                                     
-                                    assert 0 <= self.wfh_data[current_measures["wfh"]][agent.nace2] <= 1
-                                    assert 0 <= self.nace2_lockdown_data[current_measures["nace2_lockdown"]][agent.nace2_short] <= 1
-                                    assert 0 <= self.nace2_short_reduction_of_workhours[current_measures["nace2_reduction_of_workhours"]][agent.nace2_short] <= 1
-                                    
-                                    # "work at home" if "homeoffice" or "closure of workplace" or "work at home"
-                                    if (    # homeoffice?
-                                            random.random() < self.wfh_data[
-                                                current_measures["wfh"]][agent.nace2] or
-                                        
-                                            # closure of workplace?
-                                            random.random() < self.nace2_lockdown_data[
-                                                current_measures["nace2_lockdown"]][agent.nace2_short] or
-                                        
-                                            # short time work?
-                                            random.random() < self.nace2_short_reduction_of_workhours[
-                                                current_measures["nace2_reduction_of_workhours"]][agent.nace2_short]
-                                        ):
+                                    # "work at home" if "homeoffice" or "closure of workplace" or "short time work"
+                                    if agent.work_at_home:
                                         
                                         # work at home
                                         agent.initialize_activity(
-                                            "at_work",
+                                            AT_WORK,
                                             agent.home_cell,
                                             agent.work_hours_day_in_ticks,
                                             overwrite=True,
@@ -1059,7 +896,7 @@ class Sim:
                                     else:
                                         # go to work
                                         agent.initialize_activity(
-                                            "at_work",
+                                            AT_WORK,
                                             agent.work_place,
                                             agent.work_hours_day_in_ticks,
                                             overwrite=True,
@@ -1069,11 +906,11 @@ class Sim:
                                 elif agent.school:
                                     
                                     # if schools are open
-                                    if random.random() < current_measures["school"]:
+                                    if rng.random() < current_measures["school"]:
                                         
                                         # go to school
                                         agent.initialize_activity(
-                                            "at_school",
+                                            AT_SCHOOL,
                                             agent.school,
                                             self.n_ticks_at_school,
                                             overwrite=True,
@@ -1083,11 +920,11 @@ class Sim:
                                 elif agent.kindergarten:
                                     
                                     # if kindergartens are open
-                                    if random.random() < current_measures["kindergartens"]:
+                                    if rng.random() < current_measures["kindergartens"]:
                                     
                                         # go to kindergarten
                                         agent.initialize_activity(
-                                            "at_kindergarten",
+                                            AT_KINDERGARTEN,
                                             agent.kindergarten,
                                             self.n_ticks_at_kindergarten,
                                             overwrite=True,
@@ -1100,10 +937,10 @@ class Sim:
                                 
                                     # go to university
                                     if agent.student:
-                                        if random.random() < current_measures["university"]:
-                                            if "at_university" not in agent.activities_done_today:
+                                        if rng.random() < current_measures["university"]:
+                                            if not agent.activities_done_today & get_activity_flag(AT_UNIVERSITY):
                                                 agent.initialize_activity(
-                                                    "at_university",
+                                                    AT_UNIVERSITY,
                                                     agent.university,
                                                     self.n_ticks_at_university,
                                                 )
@@ -1111,26 +948,402 @@ class Sim:
                                     # shopping (from monday to friday)             
                                     if agent.age >= 14:
                                         # if supermarkets are open
-                                        if random.random() < current_measures["supermarkets"]:
+                                        if rng.random() < current_measures["supermarkets"]:
                                             # if agent has not shopped today
-                                            if "shopping" not in agent.activities_done_today:
+                                            if not agent.activities_done_today & get_activity_flag(SHOPPING):
                                                 # go shopping
                                                 agent.initialize_activity(
-                                                    "shopping",
-                                                    random.choice(agent.fav_supermarkets),
+                                                    SHOPPING,
+                                                    rng.choice(agent.fav_supermarkets),
                                                     agent.hours_at_supermarket_in_ticks,
                                                 )
                                             else:
-                                                agent.activities_done_today.append("shopping")
+                                                agent.activities_done_today |= get_activity_flag(SHOPPING)
                         
-                    # execute initialized activity
-                    agent.do_activity(
-                        world.len_x_grid_dim,
-                        world.len_y_grid_dim,
-                        world.grid_as_matrix,
-                        self.torus,
-                    )
+                    # remember agents which have initialized an activity
+                    if agent.target_cell is not None:
+                        starting_agents.append(agent)
+                
+                #######################################################################    
+                # MOVEMENT
+                #######################################################################
+                
+                """
+                Since activities have a fixed length, the tick at which an activity ends is known
+                when it starts. Therefore, only the agents whose activity starts or ends in this tick
+                are moved (e.g. all workers, pupils and kindergarten kids at once at 8 o'clock).
+                """
+                
+                # agents whose activity ends in this tick go home
+                # (unless the activity has been replaced by a new one in the meantime)
+                for agent in activity_ends.pop(tick):
+                    if agent.tick_of_activity_end == tick and agent.target_cell is None:
+                        agent.stop_activity()
+                
+                # agents which have initialized an activity go to its location
+                for agent in starting_agents:
+                    tick_of_activity_end = agent.start_activity(tick)
+                    if tick_of_activity_end == tick:
+                        agent.stop_activity()
+                    else:
+                        activity_ends.add(agent, tick_of_activity_end)
+        
+        
+        age_of_infected_agents = [
+            agent.age 
+            for agent in world.agents["agents"]
+            if agent.infection != S
+            ]
+        
+        return self.create_output_dict(output_data, age_of_infected_agents)
+    
+    
+    def internal_batch_run(
+            self,
+            n_agents,
+            location_dependend_infection_prob_dict: dict,
+            simulation_run: int,
+            n_ticks_to_quarantine,
+            n_initial_infections,
+            n_random_infections,
+            timetable,
+            seeds: list,
+        ) -> List[dict]:
         
+        """
+        This method runs a batch of model repetitions internally by the vectorized ArrayEngine
+        (or by the TauLeapEngine, if engine is "tau").
+        One world is built for each repetition (seed) and all worlds are simulated together,
+        so that the Python overhead of each tick is shared by the whole batch.
+        Returns one output dict per repetition.
+        """
+        
+        # build (or load) the world of each repetition
+        # (separate random streams for building the world and for simulating it)
+        world_seeds, simulation_seeds = zip(*[split_seed(seed) for seed in seeds])
+        rngs = [RandomNumbers(seed) for seed in simulation_seeds]
+        worlds = [self.get_world(seed) for seed in world_seeds]
+        
+        # compile the timetable of measures into lookup tables
+        measures = CompiledTimetable(
+            timetable,
+            self.wfh_data,
+            self.nace2_lockdown_data,
+            self.nace2_short_reduction_of_workhours,
+            )
+        
+        # precompute clock time, day, weekday and phase of the timetable of each tick
+        clock = Clock(
+            self.start_datetime,
+            self.end_datetime,
+            self.n_hours_per_day,
+            self.n_ticks_per_hour,
+            self.n_hours_timetravel,
+            timetable,
+            )
+        
+        # hand the built worlds over to the vectorized engine
+        engine_class = TauLeapEngine if self.engine == "tau" else ArrayEngine
+        engine = engine_class(
+            model = self,
+            worlds = worlds,
+            location_dependend_infection_prob_dict = location_dependend_infection_prob_dict,
+            n_ticks_to_quarantine = n_ticks_to_quarantine,
+            measures = measures,
+            clock = clock,
+            rngs = rngs,
+            )
+        results = engine.run(
+            simulation_run = simulation_run,
+            n_initial_infections = n_initial_infections,
+            n_random_infections = n_random_infections,
+            )
+        
+        return [
+            self.create_output_dict(output_data, age_of_infected_agents)
+            for output_data, age_of_infected_agents in results
+            ]
+    
+    
+    def get_world(self, world_seed) -> World:
+        """
+        Returns the world of one simulation run, built by the random stream of world_seed.
+        If a world cache is used (world_cache_dir) and the model has a seed, the world is
+        loaded from the cache or built and saved to the cache. Without a seed of the model,
+        each run gets fresh random seeds, so its world would never be reused.
+        """
+        
+        if self.world_cache_dir is None or self.seed is None or self.use_grid:
+            return self.build_world(RandomNumbers(world_seed))
+        
+        world_cache = WorldCache(self.world_cache_dir)
+        key = self.get_world_key(world_seed)
+        
+        # the vectorized engines do not need any Agent- and Cell-objects
+        world = world_cache.load(key, with_objects = self.engine == "agent")
+        if world is None:
+            world = self.build_world(RandomNumbers(world_seed))
+            world_cache.save(key, world)
+        
+        return world
+    
+    
+    def get_world_key(self, world_seed: np.random.SeedSequence) -> dict:
+        """
+        Returns the key of a world in the world cache:
+        everything the building of the world depends on.
+        """
+        
+        return {
+            "state": self.state,
+            "N": self.N,
+            "seed": (world_seed.entropy, world_seed.spawn_key),
+            "n_colleagues": self.n_colleagues,
+            "kids_per_kindergarten": self.kids_per_kindergarten,
+            "students_per_university": self.students_per_university,
+            "pupils_per_school": float(self.pupils_per_school),
+            "pupils_per_class": float(self.pupils_per_class),
+            "agents_per_supermarket": self.agents_per_supermarket,
+            "n_fav_supermarkets": self.n_fav_supermarkets,
+            "school_age": (self.school_age.start, self.school_age.stop),
+            "kindergarten_age": (self.kindergarten_age.start, self.kindergarten_age.stop),
+            "n_ticks_per_hour": self.n_ticks_per_hour,
+            "n_ticks_per_day": self.n_ticks_per_day,
+            "log_normal_duration_parameters": sorted(self.log_normal_duration_parameters.items()),
+            "p_sym": sorted(self.p_sym.items()),
+            "soep": int(pd.util.hash_pandas_object(self.soep).sum()),
+            }
+    
+    
+    def build_world(self, rng: RandomNumbers) -> World:
+        """
+        Builds the world of one simulation run:
+        the agent population (informed by the SOEP), the locations on the grid,
+        the assignment of the agents to the locations and the agents' infection characteristics.
+        """
+        
+        # create population
+        agent_population_in_households = self.create_soep_population(
+            N = self.N,
+            agent_class = Agent,
+            rng = rng,
+        )
+        
+        # Count agents
+        population_size = sum([1 for household in agent_population_in_households for agent in household])
+        
+        # Calculate scaling factor to empirical population size of federal state
+        #scale_to_population = empirical_population_size / population_size
+        
+        # Count pupils
+        n_pupils = sum([1 for household in agent_population_in_households for agent in household
+                        if agent.age in self.school_age])
+        
+        # Count kindergarten kids
+        n_kindergarten_kids = sum([1 for household in agent_population_in_households for agent in household
+                        if agent.age in self.kindergarten_age])
+        
+        # Count university students
+        n_students = sum([1 for household in agent_population_in_households for agent in household
+                        if agent.student])
+        
+        # Calculate number of schools needed
+        n_schools = max(n_pupils // self.pupils_per_school, 1)
+        
+        # Calculate number of supermarkets / stores needed
+        n_supermarkets = max(population_size // self.agents_per_supermarket, 1)
+        
+        # Calculate number of Kindergarten(groups) needed
+        n_kindergartens = max(n_kindergarten_kids // self.kids_per_kindergarten, 1)
+        
+        # Calculate number of universities needed
+        n_universities = max(n_students // self.students_per_university, 1)
+        
+        # Count number of Nace2-sectors in agent population and save it in df
+        n_nace2 = [agent.nace2_short for household in agent_population_in_households for agent in household]
+        n_nace2 = pd.DataFrame(
+            pd.Series(n_nace2).value_counts(), 
+            columns = ["freq_in_simpop"]
+            )
+    
+        # create world
+        world = World(self.grid_x_len, self.grid_y_len)
+        if self.use_grid:
+            world.create_grid(Cell)
+    
+        # create agent population
+        world.agents.update({"agents": []})
+    
+        families = agent_population_in_households
+        
+
+        #######################################################################
+        # build locations
+        #######################################################################
+        
+        """
+        In this and the following sections, the locations of the simulated world are created. 
+        Each location is a cell on a grid, which itself can have several "rooms". 
+        An agent is assigned to a location and a room within the location. 
+        This design was once implemented to model realistic traffic flows, 
+        e.g. to have many agents travel to the same school but split into different classrooms. 
+        However, this version of the simulation does not model movement between places anyway, 
+        so this implementation does not really make sense. 
+        It is retained, however, in order to reintroduce movement flows if necessary.
+        
+        """
+        
+        # build supermarkets
+        self.build_n_buildings_of_a_certain_type_random_on_screen("supermarket", n_supermarkets, world, rng)
+        
+        # build schools
+        self.build_n_buildings_of_a_certain_type_random_on_screen("school", n_schools, world, rng)
+    
+        # build kindergartens (at the moment these are in fact kindergarten groups)
+        self.build_n_buildings_of_a_certain_type_random_on_screen("kindergarten", n_kindergartens, world, rng)
+        
+        # build universities
+        self.build_n_buildings_of_a_certain_type_random_on_screen("university", n_universities, world, rng)
+        
+        # build one firm for each nace2-sector 
+        for nace2 in n_nace2.index:
+            if nace2 != "-1":
+                # Firmen bauen
+                self.build_n_buildings_of_a_certain_type_random_on_screen("firm" + str(nace2), 1, world, rng)
+        
+        # number of homes: on a grid, all cells without buildings, otherwise one per household
+        if world.has_grid:
+            n_homes = len(world.get_vacant_ground())
+        else:
+            n_homes = len(families)
+        
+        # build houses/homes
+        self.build_n_buildings_of_a_certain_type_random_on_screen(
+                "home", 
+                n_homes,
+                world,
+                rng,
+        )
+    
+        #######################################################################
+        # assign agents to homes
+        #######################################################################
+        
+        # get all homes
+        list_of_houses = world.get_cells_of_type("home")
+        
+        # stack of all empty homes in random order
+        # (popping from it equals a random choice among the empty homes)
+        vacant_houses = [house for house in list_of_houses if house.n_groups == 0]
+        rng.shuffle(vacant_houses)
+        
+        # for each household
+        for family in families:
+            
+            # if there are any empty homes
+            if vacant_houses:
+                
+                # randomly assign household to an empty home
+                house = vacant_houses.pop()
+            
+            else:
+                
+                # randomly assign household to a flat within a multi-family house
+                house = rng.choice(list_of_houses)
+            
+            # get flat id
+            flat = house.n_groups
+                
+            # increase number of flats in the house
+            house.n_groups += 1
+                
+            # for each household, move in flat/house
+            for agent in family:
+                agent.home_cell = house
+                agent.groups[HOME] = flat
+                agent.move_in(house)
+                
+                # add each agent to the world's population list
+                world.agents["agents"].append(agent)
+        
+        # the households of the world (their members are consecutive in the population list)
+        world.households = families
+        world.household_size = np.array([len(family) for family in families])
+                
+        #######################################################################
+        # assign supermarkets, schools, kindergartens, workplaces and universities
+        #######################################################################
+        
+        """
+        All agents are assigned to their locations (and groups/rooms within the locations)
+        at once on arrays of agent attributes (see src.sim.assignment).
+        The arrays of the assignment are kept in the world (used by the ArrayEngine),
+        the assignment is also written to the Agent- and Cell-objects.
+        """
+        
+        world.assignment = InstitutionAssignment(
+            world,
+            school_age = self.school_age,
+            kindergarten_age = self.kindergarten_age,
+            pupils_per_class = self.pupils_per_class,
+            n_colleagues = self.n_colleagues,
+            n_fav_supermarkets = self.n_fav_supermarkets,
+            generator = rng.generator,
+            )
+        
+        #######################################################################
+        # infection characteristics
+        #######################################################################
+        
+        """
+        The durations and the probability of developing symptoms are assigned to all agents
+        at once: one vectorized draw per stage of infection and a lookup of the age group.
+        They are kept as arrays in the world (for the vectorized engines) and also
+        written to the Agent-objects.
+        """
+        
+        agents = world.agents["agents"]
+        n_agents = len(agents)
+        
+        # duration of different stages of infection as parameters (m, sd) of a log-normal distribution
+        lndp = self.log_normal_duration_parameters
+        
+        durations = {}
+        for stage in ["s", "i", "r_a", "r_m"]:
+            par1, par2 = lndp[stage]
+            
+            # transform mean and sd
+            # (taken from covasim)
+            mean  = np.log(par1**2 / np.sqrt(par2 + par1**2)) # Computes the mean of the underlying normal distribution
+            sigma = np.sqrt(np.log(par2/par1**2 + 1)) # Computes sigma for the underlying normal distribution
+            
+            durations["duration_" + stage] = rng.generator.lognormal(mean, sigma, n_agents) * self.n_ticks_per_day
+        
+        # age-related probabilities of developing symptoms after an infection
+        # (age groups 0-9, 10-19, ..., 70-79, 80+)
+        age_group_bounds = np.arange(10, 90, 10)
+        p_sym_of_age_group = np.array([
+            self.p_sym[age_group]
+            for age_group in ["0-9", "10-19", "20-29", "30-39", "40-49", "50-59", "60-69", "70-79", "80+"]
+            ])
+        age = np.array([agent.age for agent in agents])
+        assert (age >= 0).all()
+        p_sym = p_sym_of_age_group[np.digitize(age, age_group_bounds)]
+        
+        # keep the arrays and write them to the agents
+        # (as python numbers, which need less memory than numpy scalars)
+        world.agent_arrays.update(durations, p_sym = p_sym)
+        for attribute, values in world.agent_arrays.items():
+            for agent, value in zip(agents, values.tolist()):
+                setattr(agent, attribute, value)
+        
+        return world
+    
+    
+    def create_output_dict(self, output_data: List[dict], age_of_infected_agents: List[int]) -> dict:
+        """
+        Creates the output of one internal run from the collected daily data.
+        """
         
         # create dataframe containing the simulated data on infections
         df = pd.DataFrame(output_data)
@@ -1141,13 +1354,6 @@ class Sim:
         # adjust number of cases so that the first simulated number (50) equals the first empirical number (approx. 50)
         df["adj_cumulative_cases/100k"] = df["cumulative_cases/100k"] - (df["cumulative_cases/100k"][0] - self.eval_data[0])
         
-
-        age_of_infected_agents = [
-            agent.age 
-            for agent in world.agents["agents"]
-            if agent.infection in ("e", "i", "m", "a", "r")
-            ]
-        
         output_dict = {
             "age_of_infected_agents": age_of_infected_agents,
             "cases": df,
@@ -1157,7 +1363,7 @@ class Sim:
         return output_dict
 
 
-    def create_soep_population(self, N: int, agent_class: Agent) -> List[List[Agent]]:
+    def create_soep_population(self, N: int, agent_class: Agent, rng: RandomNumbers) -> List[Household]:
         """
         This method creates the population of agents informed by the SOEP.
         """
@@ -1176,96 +1382,65 @@ class Sim:
             90,91,92,93,94,95,96,97,98,99,
             ]
 
-        # get unique household-IDs and corresponding weight
-        hids_and_weights = self.soep.drop_duplicates(subset=["hid"]).loc[:, ["hid", "bhhhrf"]]
+        # draw households (proportionally to their weights) and get the rows of their persons
+        rows, household_sizes = self.soep_households.sample(N, rng.generator)
+        n_agents = len(rows)
+        data = self.soep_households.data
+        
+        # NACE2 code and section
+        nace2 = data["nace2"][rows].astype(int)
+        nace2_short = data["nace2_short"][rows].astype(int)
+        # if ambiguous (nace2<=0), choose a random nace2-category and nace2-short-category
+        ambiguous = nace2 <= 0
+        nace2 = np.where(ambiguous, rng.generator.choice(nace2_codes, n_agents), nace2)
+        nace2_short = np.where(ambiguous, rng.generator.integers(1, 22, n_agents), nace2_short)
+        
+        # copy attributes from soep to agents
+        # (as python numbers, which need less memory than numpy scalars)
+        attributes = {
+            "age": data["age"][rows].astype(int).tolist(),
+            "gender": data["gender"][rows].astype(int).tolist(),
+            "nace2": nace2.tolist(),
+            "nace2_short": nace2_short.tolist(),
+            "work_hours_day_in_ticks": (data["computed_work_hours_day"][rows] * self.n_ticks_per_hour).astype(float).tolist(),
+            "hours_at_supermarket_in_ticks": (data["hours_shopping_mi"][rows] * self.n_ticks_per_hour).astype(float).tolist(),
+            "student": data["student"][rows].astype(int).tolist(),
+            "pid": data["pid"][rows].astype(int).tolist(),
+            }
         
-        # list for storing all weighted household-ids
-        weighted_hids = []
+        # create agents
+        agents = [agent_class() for i in range(n_agents)]
+        for attribute, values in attributes.items():
+            for agent, value in zip(agents, values):
+                setattr(agent, attribute, value)
         
-        # for each household
-        for i in hids_and_weights.index:
-            
-            # get household id
-            hid = hids_and_weights.loc[i, "hid"]
-            
-            # get houshold weight
-            weight = int(hids_and_weights.loc[i, "bhhhrf"])
-            
-            # create a list containing the household id "weigth" times
-            weighted_hid = [hid] * weight
-            
-            # add it to the list of all weighted household ids
-            weighted_hids.extend(weighted_hid)
-            
-    
-        # list for saving agents in households
+        # split agents into households
+        # (the attributes of the SOEP-household are stored once per household)
+        last_agent_of_household = np.cumsum(household_sizes)
+        first_row_of_household = rows[last_agent_of_household - household_sizes]
         households = []
-        
-        # population size counter 
-        n = 0
-        
-        # while actual population size is smaller than desired population size
-        while n < N:
-            
-            # choose a random household-ID from the weighted list of IDs
-            hid = random.choice(weighted_hids)
-    
-            # get data of persons living in this household
-            household_data = self.soep[self.soep["hid"] == hid].reset_index()
-            
-            # list for storing agents created below
-            household = []
-            
-            # for each agent/row in household/data
-            for i in household_data.index:
-                
-                # create new agent instance
-                agent = agent_class()
-    
-                # copy attributes from soep to agent
-                
-                # age
-                agent.age = household_data.loc[i, "age"]
-                
-                # gender
-                agent.gender = household_data.loc[i, "gender"]
-                
-                # NACE2 code
-                nace2 = household_data.loc[i, "nace2"]
-                # if ambiguous (nace2<=0), choose a random nace2-category
-                agent.nace2 = (random.choice(nace2_codes) if nace2 <= 0 else nace2)
-                
-                # NACE2 section
-                nace2_short = household_data.loc[i, "nace2_short"]
-                # if ambiguous (nace2<=0), choose a random nace2-short-category
-                agent.nace2_short = (random.randint(1, 21) if nace2 <= 0 else nace2_short) 
-                
-                # work hours
-                agent.work_hours_day_in_ticks = household_data.loc[i, "computed_work_hours_day"] * self.n_ticks_per_hour
-                
-                # shopping hours
-                agent.hours_at_supermarket_in_ticks = household_data.loc[i, "hours_shopping_mi"] * self.n_ticks_per_hour
-                
-                # student status
-                agent.student = household_data.loc[i, "student"]
-                
-                # household id
-                agent.hid = household_data.loc[i, "hid"]
-                
-                # personal id
-                agent.pid = household_data.loc[i, "pid"]
-                
-                # federal state
-                agent.federal_state = household_data.loc[i, "federal_state"]
-                
-                # append Agent to household-list
-                household.append(agent)
-            
-            # append household to list of all households
+        for last_agent, size, hid, federal_state in zip(
+                last_agent_of_household.tolist(),
+                household_sizes.tolist(),
+                data["hid"][first_row_of_household].astype(int).tolist(),
+                data["federal_state"][first_row_of_household].astype(int).tolist(),
+                ):
+            household = Household(agents[last_agent - size:last_agent], hid, federal_state)
+            for agent in household:
+                agent.household = household
             households.append(household)
-            
-            # increase the number of already created instances
-            n += len(household)
         
         # return list of households
         return households
+
+
+def internal_run_task(model: Sim, task: int, **kwargs) -> Tuple[int, List[dict]]:
+    """Runs one replication of the simulation in a worker process (see Sim.run)."""
+    model.N = kwargs["n_agents"]
+    return task, [model.internal_run(**kwargs)]
+
+
+def internal_batch_run_task(model: Sim, task: int, **kwargs) -> Tuple[int, List[dict]]:
+    """Runs a batch of replications of the simulation in a worker process (see Sim.run)."""
+    model.N = kwargs["n_agents"]
+    return task, model.internal_batch_run(**kwargs)
@@ -0,0 +1,212 @@
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+
+class RunningStatistics:
+    """
+    Running statistics of a daily time series over the replications of a run.
+    Each replication is added as soon as it is done and can be discarded afterwards:
+    The mean and the variance of each day are updated by Welford's algorithm,
+    the quantiles of each day are estimated by the P²-algorithm (Jain & Chlamtac, 1985),
+    which keeps only five markers per quantile and day instead of all values.
+    Until five replications have been added, the quantiles are computed exactly.
+    """
+
+    def __init__(self, n_days: int, quantiles: Sequence[float] = (0.05, 0.5, 0.95)):
+
+        self.n_days = n_days
+        self.quantiles = tuple(quantiles)
+
+        # number of added replications
+        self.n = 0
+
+        # mean & sum of squared deviations from the mean of each day (Welford)
+        self.mean = np.zeros(n_days)
+        self.m2 = np.zeros(n_days)
+
+        # the first five replications (to initialize the markers)
+        self.first_values: List[np.ndarray] = []
+
+        # per quantile: heights and positions of the five markers of each day (shape 5 x n_days),
+        # desired positions of the markers and their increments per replication
+        self.heights: Dict[float, np.ndarray] = {}
+        self.positions: Dict[float, np.ndarray] = {}
+        self.desired_positions: Dict[float, np.ndarray] = {}
+        self.increments: Dict[float, np.ndarray] = {
+            p: np.array([0, p / 2, p, (1 + p) / 2, 1])
+            for p in self.quantiles
+            }
+
+
+    def add(self, values: np.ndarray):
+        """Adds the daily values of one replication."""
+
+        values = np.asarray(values, dtype=float)
+        assert values.shape == (self.n_days,)
+
+        # mean & variance
+        self.n += 1
+        delta = values - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (values - self.mean)
+
+        # quantiles
+        if self.n < 5:
+            self.first_values.append(values)
+        elif self.n == 5:
+            self.first_values.append(values)
+            heights = np.sort(np.array(self.first_values), axis=0)
+            for p in self.quantiles:
+                self.heights[p] = heights.copy()
+                self.positions[p] = np.repeat(np.arange(1.0, 6.0)[:, None], self.n_days, axis=1)
+                self.desired_positions[p] = np.array([1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5])
+            self.first_values = []
+        else:
+            for p in self.quantiles:
+                self.update_markers(p, values)
+
+
+    def update_markers(self, p: float, values: np.ndarray):
+        """Updates the markers of the quantile p of all days by the values of one replication (P²)."""
+
+        q = self.heights[p]
+        n = self.positions[p]
+
+        # extreme markers & the cell of each value between the markers
+        q[0] = np.minimum(q[0], values)
+        q[4] = np.maximum(q[4], values)
+        k = (q[1:4] <= values).sum(axis=0)
+
+        # shift the positions of the markers above the value
+        n += np.arange(5)[:, None] > k
+        self.desired_positions[p] = self.desired_positions[p] + self.increments[p]
+        desired = self.desired_positions[p]
+
+        # adjust the heights of the middle markers, if they are off their desired positions
+        for i in (1, 2, 3):
+            d = desired[i] - n[i]
+            move_up = (d >= 1) & (n[i + 1] - n[i] > 1)
+            move_down = (d <= -1) & (n[i - 1] - n[i] < -1)
+            move = move_up | move_down
+            if not move.any():
+                continue
+            d = np.where(move_up, 1.0, -1.0)
+
+            # piecewise-parabolic prediction (linear, if it would violate the order of the markers)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                    )
+                neighbour = np.where(move_up, i + 1, i - 1)
+                q_neighbour = np.take_along_axis(q, neighbour[None, :], axis=0)[0]
+                n_neighbour = np.take_along_axis(n, neighbour[None, :], axis=0)[0]
+                linear = q[i] + d * (q_neighbour - q[i]) / (n_neighbour - n[i])
+            in_order = (q[i - 1] < parabolic) & (parabolic < q[i + 1])
+
+            q[i] = np.where(move, np.where(in_order, parabolic, linear), q[i])
+            n[i] = np.where(move, n[i] + d, n[i])
+
+
+    @property
+    def variance(self) -> np.ndarray:
+        """Sample variance of each day."""
+        if self.n < 2:
+            return np.full(self.n_days, np.nan)
+        return self.m2 / (self.n - 1)
+
+
+    def get_quantile(self, p: float) -> np.ndarray:
+        """Returns the (estimated) quantile p of each day."""
+        if self.n < 5:
+            return np.quantile(np.array(self.first_values), p, axis=0)
+        return self.heights[p][2].copy()
+
+
+class RunCollector:
+    """
+    Collects the outputs of the tasks of a run (see Sim.prepare_run and Sim.collect_run)
+    as they arrive, in any order. The daily time series of each replication are added to
+    running statistics right away; the output of a replication is only kept, if it is one of
+    the replications to keep (keep_replicates: True = all, False = none or a list of the
+    indices of the replications).
+    Each replication has one row per simulated day (also after the virus has died out).
+    """
+
+    # daily time series with running statistics
+    columns = (
+        "cumulative_cases",
+        "cumulative_cases/100k",
+        "adj_cumulative_cases/100k",
+        )
+
+    def __init__(
+            self,
+            name_of_run: str,
+            save_output: bool,
+            replicates_of_task: List[List[int]],
+            n_days: int,
+            keep_replicates: Union[bool, Sequence[int]],
+            ):
+
+        self.name_of_run = name_of_run
+        self.save_output = save_output
+        self.replicates_of_task = replicates_of_task
+        self.n_days = n_days
+        self.n_open_tasks = len(replicates_of_task)
+
+        if keep_replicates is True:
+            keep_replicates = [replicate for replicates in replicates_of_task for replicate in replicates]
+        elif keep_replicates is False:
+            keep_replicates = []
+        self.keep_replicates = set(keep_replicates)
+
+        self.statistics: Dict[str, RunningStatistics] = {
+            column: RunningStatistics(n_days)
+            for column in self.columns
+            }
+
+        # key = index of a kept replication; value = its output dataframe
+        self.kept_replicates: Dict[int, pd.DataFrame] = {}
+
+
+    def add(self, task: int, outputs: List[dict]):
+        """Adds the outputs of a task (one output dict per replication of the task)."""
+
+        for replicate, output in zip(self.replicates_of_task[task], outputs):
+            df = output["cases"]
+            for column in self.columns:
+                values = df[column].to_numpy()
+                assert len(values) == self.n_days, "a replication has to have one row per simulated day"
+                self.statistics[column].add(values)
+            if replicate in self.keep_replicates:
+                self.kept_replicates[replicate] = df
+
+        self.n_open_tasks -= 1
+
+
+    def is_complete(self) -> bool:
+        """Checks whether the outputs of all tasks have been added."""
+        return self.n_open_tasks == 0
+
+
+    def get_replicates(self) -> List[pd.DataFrame]:
+        """Returns the output dataframes of the kept replications (in the order of the replications)."""
+        return [self.kept_replicates[replicate] for replicate in sorted(self.kept_replicates)]
+
+
+    def get_statistics(self) -> pd.DataFrame:
+        """
+        Returns a dataframe of the statistics of each day: the mean (named like the column),
+        the standard deviation ("_sd") and the quantiles (e.g. "_q50") of each column.
+        """
+
+        df = pd.DataFrame({"day": np.arange(self.n_days)})
+        for column, statistics in self.statistics.items():
+            df[column] = statistics.mean
+            df[column + "_sd"] = np.sqrt(statistics.variance)
+            for p in statistics.quantiles:
+                df[column + "_q" + str(round(p * 100))] = statistics.get_quantile(p)
+        return df
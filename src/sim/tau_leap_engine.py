@@ -0,0 +1,134 @@
+from typing import List
+
+import numpy as np
+
+from src.sim.array_engine import ArrayEngine
+from src.sim.codes import *
+
+
+class TauLeapEngine(ArrayEngine):
+    """
+    Approximate version of the ArrayEngine for large populations (tau-leaping).
+    During stable periods, in which all agents are at home and no activity can start
+    (nights and weekends), several ticks are advanced at once.
+    Instead of simulating the contacts of each infectious agent in each tick,
+    the number of new infections of each room is drawn from a binomial distribution:
+    In one tick, each of the I infectious agents of a room with n agents meets one of
+    the n - 1 others at random and infects a susceptible one by the probability p.
+    Over k ticks, a susceptible agent thus escapes the infection by the probability
+    (1 - p / (n - 1)) ** (I * k), where I is the number of infectious agents at the
+    beginning of the period.
+    The transitions between the states of infection are still processed tick by tick.
+    All other ticks are simulated exactly like in the ArrayEngine.
+    Since a period is only advanced at once if all agents of all replicates are at home,
+    the results of a replicate depend on the other replicates of a batch (Sim.run
+    simulates each replicate of this engine on its own).
+    """
+
+    def __init__(self, *args, min_leap_len: int = 2, **kwargs):
+
+        super().__init__(*args, **kwargs)
+
+        # minimal number of ticks to advance at once
+        self.min_leap_len = min_leap_len
+
+        # for each tick, the number of consecutive ticks (starting with this tick) in which
+        # no activity can start and no new day begins (except in the first tick)
+        clock = self.clock
+        self.n_quiet_ticks: List[int] = [0] * clock.n_ticks
+        n_quiet_ticks = 0
+        for tick in reversed(range(clock.n_ticks)):
+            quiet = clock.weekday[tick] >= 5 or (
+                clock.hour[tick] != 8 and clock.hour[tick] not in self.model.day_time
+                )
+            if not quiet:
+                n_quiet_ticks = 0
+            elif tick + 1 < clock.n_ticks and clock.new_day[tick + 1]:
+                n_quiet_ticks = 1
+            else:
+                n_quiet_ticks += 1
+            self.n_quiet_ticks[tick] = n_quiet_ticks
+
+
+    def get_leap_len(self, tick: int) -> int:
+        """Returns the number of ticks which can be advanced at once, starting with the given tick."""
+
+        leap_len = self.n_quiet_ticks[tick]
+        if leap_len < self.min_leap_len:
+            return 1
+
+        # all agents have to be at home
+        if (self.activity != NO_ACTIVITY).any() or (self.target_room >= 0).any():
+            return 1
+
+        return leap_len
+
+
+    def advance(self, tick: int, simulation_clock_time: int, weekday: int, phase: int):
+        """Simulates one tick or, during a stable period, several ticks at once."""
+
+        leap_len = self.get_leap_len(tick)
+        if leap_len == 1:
+            super().advance(tick, simulation_clock_time, weekday, phase)
+            return
+
+        self.update_status_of_infection(tick)
+
+        self.infect_binomial(tick, leap_len)
+
+        for next_tick in range(tick + 1, tick + leap_len):
+            self.update_status_of_infection(next_tick)
+
+        # catch up on the decisions to stay at home and to isolate households
+        self.decide_to_stay_at_home(tick + leap_len - 1, phase)
+
+        self.next_tick_to_simulate = tick + leap_len
+
+
+    def infect_binomial(self, tick: int, leap_len: int):
+        """
+        Draws the new infections of the next leap_len ticks per room from binomial
+        distributions and exposes randomly chosen susceptible agents of each room.
+        """
+
+        if len(self.infectious_agents) == 0:
+            return
+
+        self.sort_agents_by_room()
+
+        # rooms containing infectious and susceptible agents
+        rooms, n_infectious = np.unique(self.room[self.infectious_agents], return_counts=True)
+        n_susceptible = self.n_susceptible_in_room[rooms]
+        relevant = n_susceptible > 0
+        rooms = rooms[relevant]
+        n_infectious = n_infectious[relevant]
+        n_susceptible = n_susceptible[relevant]
+        room_size = self.room_size[rooms]
+        if len(rooms) == 0:
+            return
+
+        # susceptible agents of these rooms (the first agents of each room in the sorting)
+        room_of_member = np.repeat(np.arange(len(rooms)), n_susceptible)
+        first_member = np.cumsum(n_susceptible) - n_susceptible
+        members = self.agents_sorted_by_room[
+            np.repeat(self.room_start[rooms] - first_member, n_susceptible) + np.arange(n_susceptible.sum())
+            ]
+
+        # number of new infections per room
+        p = self.infection_prob_of_room[rooms] / (room_size - 1)
+        p_infection = 1 - (1 - p) ** (n_infectious * leap_len)
+        replicate_of_room = self.replicate_of_room[rooms]
+        n_new_infections = self.draw(replicate_of_room, "binomial", n_susceptible, p_infection)
+        if n_new_infections.sum() == 0:
+            return
+
+        # choose the newly infected agents at random within each room
+        order = np.lexsort((self.draw(replicate_of_room[room_of_member], "random"), room_of_member))
+        room_of_member = room_of_member[order]
+        rank_in_room = np.arange(len(members)) - (np.cumsum(n_susceptible) - n_susceptible)[room_of_member]
+        exposed = members[order][rank_in_room < n_new_infections[room_of_member]]
+
+        # expose them at a random tick of the period
+        tick_of_exposure = tick + self.draw(self.replicate[exposed], "integers", 0, leap_len)
+        for exposure_tick in np.unique(tick_of_exposure):
+            self.expose(exposed[tick_of_exposure == exposure_tick], int(exposure_tick))
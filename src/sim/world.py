@@ -1,21 +1,38 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
 from src.sim.cell import Cell
-from src.sim.helper import *
+from src.sim.codes import get_location_type
+from src.sim.rng import RandomNumbers
 
 class World:
+    """
+    The locations and agents of one simulated world.
+
+    All locations are kept in a flat registry (locations), indexed by their type
+    (cells_by_type); each location is a Cell-object with a number of rooms (n_groups).
+    By default, a world has no grid: locations are simply added to the registry
+    (add_location), so the number of locations, e.g. homes, is not limited.
+    The grid (create_grid) is only kept for compatibility, e.g. to reintroduce the
+    modelling of movement. In a world with a grid, the registry consists of all cells
+    of the grid and buildings are built on the cells (see Building).
+    """
     def __init__(
         self,
-        len_x_grid_dim: int,
-        len_y_grid_dim: int,
+        len_x_grid_dim: Optional[int] = None,
+        len_y_grid_dim: Optional[int] = None,
         ):
 
         self.len_x_grid_dim = len_x_grid_dim
         self.len_y_grid_dim = len_y_grid_dim
 
-        self.half_x_grid_dim = int(self.len_x_grid_dim / 2)
-        self.half_y_grid_dim = int(self.len_y_grid_dim / 2)
+        # flat registry of all locations (the id of a location is its position in the list)
+        self.locations: List[Cell] = []
 
-        self.grid_as_matrix: List[List[Cell]] = [[]]
-        self.grid_as_flat_list: List[Cell] = []
+        # grid (only if create_grid() is called)
+        self.grid_as_matrix: Optional[List[List[Cell]]] = None
+        self.grid_as_flat_list: List[Cell] = self.locations
 
         self.NW_grid_as_flat_list: List[Cell] = []
         self.NE_grid_as_flat_list: List[Cell] = []
@@ -24,11 +41,68 @@ class World:
 
         self.agents: dict = {}
 
+        # households and their sizes (the members of a household are consecutive in agents["agents"])
+        self.households: list = []
+        self.household_size: Optional[np.ndarray] = None
+
+        # assignment of the agents to their locations as arrays (see src.sim.assignment)
+        self.assignment = None
+
+        # attributes of the agents and locations as arrays
+        # (all attributes of a world loaded from the WorldCache without Agent- and Cell-objects,
+        # otherwise the attributes which were drawn in vectorized form)
+        self.agent_arrays: Dict[str, np.ndarray] = {}
+        self.location_arrays: Dict[str, np.ndarray] = {}
+
+        # index of all cells by cell type (e.g. "street", "home", "school", "firm47")
+        # The cells of type "street" are the vacant ground, on which buildings can be built.
+        self.cells_by_type: Dict[str, List[Cell]] = {}
+
+        # position of each cell in its list of cells_by_type (for removing it in O(1))
+        self.position_in_cells_by_type: Dict[Cell, int] = {}
+
+
+    @property
+    def has_grid(self) -> bool:
+        return self.grid_as_matrix is not None
+
+
+    @property
+    def n_agents(self) -> int:
+        if self.agents.get("agents"):
+            return len(self.agents["agents"])
+        return len(self.agent_arrays["age"])
+
+
+    @property
+    def n_locations(self) -> int:
+        if self.locations:
+            return len(self.locations)
+        return len(self.location_arrays["location_type"])
+
+
+    def get_agent_array(self, attribute: str, dtype = None) -> np.ndarray:
+        """Returns an attribute of all agents as array."""
+        if attribute in self.agent_arrays:
+            return np.asarray(self.agent_arrays[attribute], dtype=dtype)
+        return np.array([getattr(agent, attribute) for agent in self.agents["agents"]], dtype=dtype)
+
+
+    def get_location_array(self, attribute: str) -> np.ndarray:
+        """Returns an attribute of all locations as array."""
+        if attribute in self.location_arrays:
+            return np.asarray(self.location_arrays[attribute])
+        return np.array([getattr(cell, attribute) for cell in self.locations])
+
 
     def create_grid(self, cell_class: int = "standard"):
 
+        assert len(self.locations) == 0, "the grid has to be created before adding any location"
+
+        half_x_grid_dim = int(self.len_x_grid_dim / 2)
+        half_y_grid_dim = int(self.len_y_grid_dim / 2)
+
         self.grid_as_matrix = []
-        self.grid_as_flat_list = []
 
         for y in range(self.len_y_grid_dim):
             row = []
@@ -42,15 +116,17 @@ class World:
 
                 row.append(cell)
 
-                self.grid_as_flat_list.append(cell)
+                cell.location_id = len(self.locations)
+                self.locations.append(cell)
+                self.add_to_cells_by_type(cell)
 
-                if x < self.half_x_grid_dim:
-                    if y < self.half_y_grid_dim:
+                if x < half_x_grid_dim:
+                    if y < half_y_grid_dim:
                         self.NW_grid_as_flat_list.append(cell)
                     else:
                         self.SW_grid_as_flat_list.append(cell)
                 else:
-                    if y < self.half_y_grid_dim:
+                    if y < half_y_grid_dim:
                         self.NE_grid_as_flat_list.append(cell)
                     else:
                         self.SE_grid_as_flat_list.append(cell)
@@ -59,14 +135,59 @@ class World:
             self.grid_as_matrix.append(row)
 
 
+    def add_location(self, cell_type: str) -> Cell:
+        """Adds a new location of the given type to a world without grid."""
+
+        assert not self.has_grid, "in a world with a grid, buildings are built on the cells of the grid"
+
+        cell = Cell()
+        cell.cell_type = cell_type
+        cell.location_type = get_location_type(cell_type)
+        cell.location_id = len(self.locations)
+        self.locations.append(cell)
+        self.add_to_cells_by_type(cell)
+        return cell
+
+
+    def add_to_cells_by_type(self, cell: Cell):
+        cells = self.cells_by_type.setdefault(cell.cell_type, [])
+        self.position_in_cells_by_type[cell] = len(cells)
+        cells.append(cell)
+
+
+    def remove_from_cells_by_type(self, cell: Cell):
+        # replace the cell by the last cell of the same type
+        cells = self.cells_by_type[cell.cell_type]
+        position = self.position_in_cells_by_type.pop(cell)
+        last_cell = cells.pop()
+        if last_cell is not cell:
+            cells[position] = last_cell
+            self.position_in_cells_by_type[last_cell] = position
+
+
+    def change_cell_type(self, cell: Cell, cell_type: str):
+        self.remove_from_cells_by_type(cell)
+        cell.cell_type = cell_type
+        self.add_to_cells_by_type(cell)
+
+
+    def get_cells_of_type(self, cell_type: str) -> List[Cell]:
+        return self.cells_by_type.get(cell_type, [])
+
+
+    def get_vacant_ground(self) -> List[Cell]:
+        return self.get_cells_of_type("street")
+
+
     def get_empty_cells(self):
-        empty_cells = [cell for cell in self.grid_as_flat_list if len(cell.residents) == 0]
+        empty_cells = [cell for cell in self.grid_as_flat_list if not any(cell.rooms.values())]
         return empty_cells
 
 
     def place_agents_on_grid(
             self,
             population,
+            rng: RandomNumbers,
             rule = "random_on_empty_cells",
     ):
         
@@ -74,10 +195,11 @@ class World:
 
         if rule == "random_on_empty_cells":
 
-            assert len(self.get_empty_cells()) >= len(population)
+            empty_cells = self.get_empty_cells()
+            assert len(empty_cells) >= len(population)
 
-            for agent in population:
-                new_residence_cell = random.choice(self.get_empty_cells())
+            # each agent moves into a different empty cell
+            for agent, new_residence_cell in zip(population, rng.sample(empty_cells, len(population))):
                 agent.move_out()
                 agent.move_in(new_residence_cell)
 
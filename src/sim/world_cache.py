@@ -0,0 +1,197 @@
+import hashlib
+import os
+from pathlib import Path
+import shutil
+import tempfile
+from typing import Dict, Optional
+
+import numpy as np
+
+from src.sim.agent import Agent
+from src.sim.assignment import InstitutionAssignment
+from src.sim.codes import *
+from src.sim.population import Household
+from src.sim.world import World
+
+
+class WorldCache:
+    """
+    On-disk cache of built worlds.
+    A world is stored as a directory of .npy-files: the attributes of the agents,
+    the sizes of the households, the types and numbers of rooms of the locations and
+    the arrays of the assignment of the agents to their locations (see src.sim.assignment).
+    The name of the directory is a hash of the key, which contains everything the world
+    depends on (federal state, N, seed, structural parameters, SOEP-data), so that a
+    cached world is not reused after any of these has changed.
+    The arrays are loaded memory-mapped. If no Agent- and Cell-objects are needed
+    (vectorized engines), the loaded world consists only of these arrays.
+    Only worlds without grid can be cached.
+    """
+
+    # version of the format (to be increased if the format or the building of worlds changes)
+    version = 3
+
+    # attributes of the agents
+    agent_attributes = (
+        "age",
+        "gender",
+        "nace2",
+        "nace2_short",
+        "work_hours_day_in_ticks",
+        "hours_at_supermarket_in_ticks",
+        "student",
+        "pid",
+        "duration_s",
+        "duration_i",
+        "duration_r_a",
+        "duration_r_m",
+        "p_sym",
+        )
+
+    def __init__(self, directory: Path):
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+
+    def get_path(self, key: dict) -> Path:
+        """Returns the directory of the world with the given key."""
+
+        key = dict(key, version=self.version)
+        digest = hashlib.sha1(repr(sorted(key.items())).encode()).hexdigest()
+        return self.directory / digest
+
+
+    def load(self, key: dict, with_objects: bool = True) -> Optional[World]:
+        """
+        Returns the cached world with the given key (None, if it is not cached).
+        If with_objects is False, the world contains no Agent- and Cell-objects.
+        """
+
+        path = self.get_path(key)
+        if not path.is_dir():
+            return None
+
+        arrays = {
+            file.stem: np.load(file, mmap_mode="r", allow_pickle=False)
+            for file in path.glob("*.npy")
+            }
+
+        return self.unpack(arrays, with_objects)
+
+
+    def save(self, key: dict, world: World):
+        """Saves the world with the given key."""
+
+        assert not world.has_grid, "only worlds without grid can be cached"
+
+        path = self.get_path(key)
+        if path.is_dir():
+            return
+
+        # write to a temporary directory first, so that other processes never see an incomplete world
+        temporary_path = Path(tempfile.mkdtemp(dir=self.directory))
+        try:
+            for name, array in self.pack(world).items():
+                np.save(temporary_path / (name + ".npy"), array, allow_pickle=False)
+            os.rename(temporary_path, path)
+        except OSError:
+            # another process has saved the same world in the meantime
+            shutil.rmtree(temporary_path, ignore_errors=True)
+
+
+    def pack(self, world: World) -> Dict[str, np.ndarray]:
+        """Returns the arrays representing the world."""
+
+        agents = world.agents["agents"]
+        assignment = world.assignment
+
+        arrays = {}
+
+        # agents
+        for attribute in self.agent_attributes:
+            arrays["agent_" + attribute] = np.array([getattr(agent, attribute) for agent in agents])
+
+        # households (the agents of a household are consecutive)
+        arrays["household_size"] = world.household_size
+        arrays["household_hid"] = np.array([household.hid for household in world.households])
+        arrays["household_federal_state"] = np.array([household.federal_state for household in world.households])
+
+        # locations
+        arrays["location_cell_type"] = np.array([cell.cell_type for cell in world.locations])
+        arrays["location_location_type"] = np.array([cell.location_type for cell in world.locations])
+        arrays["location_n_groups"] = np.array([cell.n_groups for cell in world.locations])
+        arrays["location_n_users"] = np.array([cell.n_users for cell in world.locations])
+
+        # assignment
+        for name in InstitutionAssignment.arrays:
+            arrays["assignment_" + name] = getattr(assignment, name)
+
+        return arrays
+
+
+    def unpack(self, arrays: Dict[str, np.ndarray], with_objects: bool = True) -> World:
+        """Returns the world represented by the arrays."""
+
+        world = World()
+
+        # assignment
+        assignment = InstitutionAssignment.from_arrays({
+            name: arrays["assignment_" + name]
+            for name in InstitutionAssignment.arrays
+            })
+        world.assignment = assignment
+        world.household_size = arrays["household_size"]
+
+        if not with_objects:
+            world.agent_arrays = {
+                attribute: arrays["agent_" + attribute]
+                for attribute in self.agent_attributes
+                }
+            world.location_arrays = {
+                "n_groups": arrays["location_n_groups"],
+                "location_type": arrays["location_location_type"],
+                }
+            return world
+
+        # locations
+        for cell_type, n_groups, n_users in zip(
+                arrays["location_cell_type"].tolist(),
+                arrays["location_n_groups"].tolist(),
+                arrays["location_n_users"].tolist(),
+                ):
+            cell = world.add_location(cell_type)
+            cell.n_groups = n_groups
+            cell.n_users = n_users
+        cells = world.locations
+
+        # agents
+        n_agents = len(arrays["agent_age"])
+        agents = [Agent() for i in range(n_agents)]
+        for attribute in self.agent_attributes:
+            for agent, value in zip(agents, arrays["agent_" + attribute].tolist()):
+                setattr(agent, attribute, value)
+        world.agents["agents"] = agents
+
+        # homes and households
+        for agent, home, flat in zip(agents, assignment.home_cell.tolist(), assignment.home_group.tolist()):
+            agent.home_cell = cells[home]
+            agent.groups[HOME] = flat
+            agent.move_in(cells[home])
+
+        last_agent = 0
+        for size, hid, federal_state in zip(
+                arrays["household_size"].tolist(),
+                arrays["household_hid"].tolist(),
+                arrays["household_federal_state"].tolist(),
+                ):
+            household = Household(agents[last_agent:last_agent + size], hid, federal_state)
+            for agent in household:
+                agent.household = household
+            world.households.append(household)
+            last_agent += size
+
+        # other locations
+        assignment.write_to_agents(agents, cells)
+
+        return world